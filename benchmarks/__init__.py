@@ -0,0 +1,5 @@
+"""
+Benchmarks for literate. Run them from the repository root, e.g.
+
+    python -m benchmarks.imports
+"""
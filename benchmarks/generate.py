@@ -0,0 +1,98 @@
+"""
+Generate synthetic literate documents for benchmarking.
+
+    python -m benchmarks.generate [--regions N] [--lines N] [--alignment F]
+                                  [--haskell F] [--seed N] > doc.tex
+"""
+import argparse
+import random
+import sys
+
+_prose = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. Curabitur placerat neque vitae "
+          "neque scelerisque, id blandit tortor condimentum. Nullam ut pellentesque mi, eget suscipit "
+          "elit; 100% of the \\emph{examples} use $x_1$ & friends.\n")
+
+_names = ['foo', 'bar', 'go', 'result', 'xs', 'accumulate', 'f', 'prodMinusSum', 'input', 'y']
+
+_haskell_exprs = [
+    'x + 5', 'map (\\x -> x * 2) xs', 'foldr (+) 0 xs', 'case x of { Just y -> y; _ -> 0 }',
+    'putStrLn "hello, world"', 'xs >>= f . g $ h', 'let z = x `div` 2 in z ^ 2',
+    'zipWith3 (\\a b c -> a + b * c) as bs cs', '[ (a, b) | a <- [1..10], b <- "xyz" ]',
+]
+
+_haskell_lines = [
+    'main = do', '  print (foo 10)', 'data T = A | B  -- comment with % & #', '{- block comment -}',
+    'module Main where', 'import qualified Data.Map as M', '  where',
+]
+
+_scala_exprs = [
+    'x + y', 'xs.map(_ * 2).sum', 'input match { case (a, b) => a }', 's"interp ${x} $y"',
+    'new Foo[Int](3)', 'if (x > 100) true else false', 'List(1, 2, 3).foldLeft(0)(_ + _)',
+]
+
+_scala_lines = [
+    'object Graph extends ExpressionGraphBuilder {', '}', 'import mutators._',
+    'def f[A <: B](a: A): Int = 3', '// comment with $ and _', 'trait X { val y: Map[Int, String] }',
+]
+
+
+def _haskell_line(rng, aligned, width):
+    if rng.random() < 0.25:
+        return rng.choice(_haskell_lines)
+    lhs = '{} {}'.format(rng.choice(_names), rng.choice(['x', 'x y', '0', '(Just x)']))
+    if aligned:
+        lhs = lhs.ljust(width)
+    return '{} = {}'.format(lhs, rng.choice(_haskell_exprs))
+
+
+def _scala_line(rng, aligned, width):
+    if rng.random() < 0.25:
+        return '  ' + rng.choice(_scala_lines)
+    lhs = '  val {}'.format(rng.choice(_names))
+    if aligned:
+        lhs = lhs.ljust(width)
+    return '{} = {}'.format(lhs, rng.choice(_scala_exprs))
+
+
+def generate(regions=100, lines=20, alignment=0.5, haskell=0.5, seed=0):
+    """
+    Return a document with the given number of code regions of the given
+    number of lines each. alignment is the fraction of definitions whose
+    '=' is aligned with their neighbours, and haskell is the fraction of
+    regions in Haskell rather than Scala.
+    """
+    rng = random.Random(seed)
+    out = []
+    for i in range(regions):
+        out.append('\\section{{Part {}}}\n'.format(i + 1))
+        out.append(_prose)
+        if rng.random() < haskell:
+            lang, line = 'haskell', _haskell_line
+        else:
+            lang, line = 'scala', _scala_line
+        width = rng.randint(14, 24)
+        body = [line(rng, rng.random() < alignment, width) for _ in range(lines)]
+        out.append('\\begin{{code}}{{lang={}}}\n{}\n\\end{{code}}\n'.format(lang, '\n'.join(body)))
+    out.append(_prose)
+    return ''.join(out)
+
+
+def add_arguments(parser):
+    """Add the generator options to an ArgumentParser."""
+    parser.add_argument('--regions', type=int, default=100)
+    parser.add_argument('--lines', type=int, default=20)
+    parser.add_argument('--alignment', type=float, default=0.5)
+    parser.add_argument('--haskell', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic literate document')
+    add_arguments(parser)
+    args = parser.parse_args()
+    sys.stdout.write(generate(args.regions, args.lines, args.alignment, args.haskell, args.seed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Measure how long importing literate takes in a fresh interpreter, and which
+heavy modules the import drags in.
+
+    python -m benchmarks.imports [-n RUNS] [module ...]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# Modules that should only be imported once they are actually needed
+HEAVY = ['pygments', 'literate.renderer', 'multiprocessing', 'sqlite3', 'asyncio', 'concurrent.futures']
+
+_probe = """
+import json, sys, time
+start = time.time()
+for name in sys.argv[1:]:
+    __import__(name)
+elapsed = time.time() - start
+heavy = [m for m in %r if sys.modules.get(m) is not None]
+print(json.dumps({'time': elapsed, 'heavy': heavy}))
+""" % (HEAVY,)
+
+
+def measure(modules, runs=10):
+    """
+    Import modules in runs fresh interpreters. Returns the sorted import
+    times in seconds and the heavy modules loaded by the last run.
+    """
+    times = []
+    result = None
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', _probe] + list(modules))
+        result = json.loads(output.decode('utf-8'))
+        times.append(result['time'])
+    return sorted(times), result['heavy']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time of literate')
+    parser.add_argument('modules', nargs='*', default=['literate', 'literate.frontend'])
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    times, heavy = measure(args.modules, args.runs)
+    print('import {}: min {:.1f} ms, median {:.1f} ms over {} runs'.format(
+        ', '.join(args.modules), times[0] * 1000, times[len(times) // 2] * 1000, len(times)))
+    print('heavy modules loaded: {}'.format(', '.join(heavy) or 'none'))
+    return 1 if heavy else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Run the stage benchmarks on a generated document, optionally saving the
+results or comparing them against a saved baseline.
+
+    python -m benchmarks.run [generator options] [--repeat N] [--stage NAME]
+                             [--save FILE] [--baseline FILE] [--tolerance F]
+
+Exits with status 1 if any stage is slower than the baseline by more than
+the tolerance.
+"""
+import argparse
+import json
+import sys
+
+from benchmarks import generate, stages
+
+PARAMS = ['regions', 'lines', 'alignment', 'haskell', 'seed']
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return a dictionary from stage name to the ratio of its time to the
+    baseline time, and the list of stages slower than the baseline by more
+    than tolerance.
+    """
+    ratios = {}
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('stages', {}).get(name)
+        if not base or not base['time']:
+            continue
+        ratios[name] = result['time'] / base['time']
+        if ratios[name] > 1 + tolerance:
+            regressions.append(name)
+    return ratios, regressions
+
+
+def _format_memory(kib):
+    return '-' if kib is None else '{:.1f}'.format(kib / 1024.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the stages of the render pipeline')
+    generate.add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--stage', action='append', choices=[name for name, func in stages.STAGES])
+    parser.add_argument('--save', metavar='FILE')
+    parser.add_argument('--baseline', metavar='FILE')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    params = dict((name, getattr(args, name)) for name in PARAMS)
+    doc = stages.Document(generate.generate(**params))
+    results = stages.run(doc, args.stage, args.repeat)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('params') != params:
+            sys.stderr.write('warning: the baseline was generated with different parameters\n')
+    ratios, regressions = compare(results, baseline, args.tolerance) if baseline else ({}, [])
+
+    print('{} regions, {} code lines, {} bytes'.format(
+        len(doc.regions), sum(len(region.text.splitlines()) for _, region in doc.regions), len(doc.text)))
+    print('{:<12} {:>10} {:>10} {:>10} {:>10}'.format('stage', 'min ms', 'median ms', 'peak MiB', 'baseline'))
+    for name, func in stages.STAGES:
+        if name not in results:
+            continue
+        result = results[name]
+        ratio = '{:+.0f}%'.format((ratios[name] - 1) * 100) if name in ratios else '-'
+        if name in regressions:
+            ratio += ' !'
+        print('{:<12} {:>10.2f} {:>10.2f} {:>10} {:>10}'.format(
+            name, result['time'] * 1000, result['median'] * 1000, _format_memory(result['memory']), ratio))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'params': params, 'stages': results}, f, indent=2, sort_keys=True)
+    if regressions:
+        sys.stderr.write('slower than the baseline: {}\n'.format(', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Stage-level benchmarks of the render pipeline. Every stage runs over all
+code regions of a document, with the results of the earlier stages computed
+up front so that each one is measured in isolation.
+"""
+import copy
+import gc
+import os
+import time
+
+import pygments
+
+from literate.corpus import Corpus
+from literate import scanner
+
+
+class _Replay(object):
+    """A stand-in lexer that hands back tokens lexed ahead of time."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def get_tokens(self, text):
+        return iter(self.tokens[text])
+
+
+class Document(object):
+    """A document together with the intermediate results of every stage."""
+
+    def __init__(self, text):
+        self.text = text
+        self.corpus = Corpus(text)
+        self.regions = [(self.corpus._renderer(region.options.get('lang')), region)
+                        for region in self.corpus.code_regions]
+        self.lexed = [list(pygments.lex(region.text, renderer.lexer)) for renderer, region in self.regions]
+
+        replays = {}
+        for (renderer, region), lexed in zip(self.regions, self.lexed):
+            replay = replays.get(renderer)
+            if replay is None:
+                replay = replays[renderer] = copy.copy(renderer)
+                replay._lexer = _Replay({})
+            replay._lexer.tokens[region.text] = lexed
+        self.replays = [(replays[renderer], region) for renderer, region in self.regions]
+
+        self.streams = tokens(self)
+        self.transformed = transform(self)
+        self.respaced = respace(self)
+
+
+def scan(doc):
+    config = doc.corpus.config
+    return scanner.scan(doc.text, config.delimiters.begin, config.delimiters.end)
+
+
+def lex(doc):
+    return [list(pygments.lex(region.text, renderer.lexer)) for renderer, region in doc.regions]
+
+
+def tokens(doc):
+    streams = []
+    for renderer, region in doc.replays:
+        stream = renderer.get_token_stream(region)
+        stream.columns
+        streams.append(stream)
+    return streams
+
+
+def transform(doc):
+    return [renderer.transform(stream, *renderer.region_options(region))
+            for (renderer, region), stream in zip(doc.regions, doc.streams)]
+
+
+def respace(doc):
+    return [renderer.pre_substitute_hook(transformed)
+            for (renderer, region), transformed in zip(doc.regions, doc.transformed)]
+
+
+def substitute(doc):
+    return [renderer.substitute_all(respaced)
+            for (renderer, region), respaced in zip(doc.regions, doc.respaced)]
+
+
+def render(doc):
+    return Corpus(doc.text).render()
+
+
+#: The benchmarked stages, in pipeline order
+STAGES = [
+    ('scan', scan),
+    ('lex', lex),
+    ('tokens', tokens),
+    ('transform', transform),
+    ('respace', respace),
+    ('substitute', substitute),
+    ('render', render),
+]
+
+
+def measure_time(func, doc, repeat=5):
+    """
+    Run func(doc) repeat times and return the fastest and median times in
+    seconds. As with timeit, the garbage collector is off while timing.
+    """
+    times = []
+    enabled = gc.isenabled()
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            gc.disable()
+            start = time.time()
+            func(doc)
+            times.append(time.time() - start)
+            if enabled:
+                gc.enable()
+    finally:
+        if enabled:
+            gc.enable()
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+def _status(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def measure_memory(func, doc):
+    """
+    Return how many KiB the resident set grows by while running func(doc)
+    once, or None where that cannot be measured. The stage runs in a forked
+    child, so that its peak is not hidden by earlier high-water marks.
+    """
+    if not hasattr(os, 'fork') or not os.path.exists('/proc/self/status'):
+        return None
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            before = _status('VmRSS')
+            func(doc)
+            os.write(write_fd, str(_status('VmHWM') - before).encode('ascii'))
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    chunks = []
+    while True:
+        chunk = os.read(read_fd, 64)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    data = b''.join(chunks)
+    return int(data) if data else None
+
+
+def run(doc, stages=None, repeat=5):
+    """
+    Benchmark the named stages (every stage by default) on doc and return a
+    dictionary of results by stage name.
+    """
+    results = {}
+    for name, func in STAGES:
+        if stages and name not in stages:
+            continue
+        best, median = measure_time(func, doc, repeat)
+        results[name] = {'time': best, 'median': median, 'memory': measure_memory(func, doc)}
+    return results
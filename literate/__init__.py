@@ -1,8 +1,22 @@
-from .corpus import Corpus
+import sys
+
+from .corpus import Corpus, RenderError, render_stream
 from .region import Region, CodeRegion
-from .config import Config
-import utils
-import renderer
+from .config import Config, LazyConfig
+
+__version__ = '0.1'
+
+# Loaded on first use; the renderers and pygments are only imported once a
+# code block of their language is rendered
+default_config = LazyConfig('literate.conf.json', module=True)
+default_format = LazyConfig('literate.fmt.json', module=True)
 
-default_config = Config(utils.load_json('literate.conf.json', True))
-default_format = Config(utils.load_json('literate.fmt.json', True))
\ No newline at end of file
+if sys.version_info >= (3, 7):
+    def render_async(text, config=None, formats=None, timeout=None):
+        """
+        Render a document in a thread pool without blocking the asyncio event
+        loop; returns a coroutine. See literate.aio for pools of processes,
+        limits on concurrent renders and rendering snippets.
+        """
+        from literate.aio import render_async
+        return render_async(text, config, formats, timeout)
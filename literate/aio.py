@@ -0,0 +1,200 @@
+"""
+An asyncio API for rendering documents and code snippets without blocking the
+event loop. Renders run in a thread or process pool, at most a fixed number
+at a time, and can be cancelled or given a timeout. Requires Python 3.7.
+
+    output = await literate.render_async(text, config, formats)
+
+    async with AsyncRenderer('process', workers=4, cache=RenderCache()) as renderer:
+        output = await renderer.render(text, timeout=10)
+        snippet = await renderer.render_code('map f xs', 'haskell')
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+import weakref
+
+import literate
+from literate.corpus import Corpus
+from literate.region import CodeRegion
+from literate.registry import default_registry
+
+
+class AsyncRenderer(object):
+    """
+    Renders documents in a pool of threads or processes on behalf of asyncio
+    code. executor is 'thread', 'process' or a concurrent.futures.Executor,
+    which is then left for the caller to shut down. No more than limit
+    renders (by default one per worker) run at once; the others wait for a
+    free slot.
+
+    Threads share the renderers of the registry and the cache, so every
+    render benefits from the work of the previous ones. Each worker process
+    keeps its own renderers warm between renders, and opens its own
+    connection to the cache directory.
+
+    Cancelling a render, or letting its timeout expire, drops it if it has
+    not started yet. A render that is already running cannot be interrupted:
+    its result is discarded and its slot is freed once it finishes.
+    """
+
+    def __init__(self, executor='thread', workers=None, limit=None, cache=None, registry=None):
+        if executor not in ('thread', 'process') and not isinstance(executor, concurrent.futures.Executor):
+            raise ValueError("executor must be 'thread', 'process' or an Executor")
+        if executor == 'process' and registry is not None:
+            raise ValueError('A registry cannot be shared with worker processes')
+        self.workers = workers or os.cpu_count() or 1
+        self.limit = limit or self.workers
+        self.cache = cache
+        self.registry = registry or default_registry
+        self._kind = executor if isinstance(executor, str) else None
+        self._executor = None if self._kind else executor
+        self._lock = threading.Lock()
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def executor(self):
+        """The pool renders run in, created when it is first needed."""
+        with self._lock:
+            if self._executor is None:
+                if self._kind == 'process':
+                    cache = self.cache
+                    args = (cache.directory, cache.max_size, cache.timeout) if cache is not None else None
+                    self._executor = concurrent.futures.ProcessPoolExecutor(
+                        self.workers, initializer=_init_process, initargs=(args,))
+                else:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(self.workers)
+            return self._executor
+
+    def _semaphore(self, loop):
+        # asyncio primitives belong to one event loop, so each loop that uses
+        # this renderer gets a semaphore of its own
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore(loop)
+        await semaphore.acquire()
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        def release(future):
+            # Hold the slot until the work is really done, even if the caller
+            # stopped waiting for it
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                # The event loop is already closed
+                pass
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def _shared(self):
+        if self._kind == 'process':
+            return None, None
+        return self.cache, self.registry
+
+    async def render(self, text, config=None, formats=None, timeout=None):
+        """
+        Render a document like Corpus(text, config, formats).render(). Raises
+        asyncio.TimeoutError if it takes longer than timeout seconds, including
+        the wait for a free slot.
+        """
+        return await asyncio.wait_for(
+            self._run(_render_document, text, config, formats, *self._shared()), timeout)
+
+    async def render_code(self, code, lang, config=None, formats=None, timeout=None):
+        """Render a snippet of code in the given language, as if it were a code block of a document."""
+        return await asyncio.wait_for(
+            self._run(_render_code, code, lang, config, formats, *self._shared()), timeout)
+
+    async def warm(self, timeout=None):
+        """
+        Build the renderer and lexer of every configured language ahead of
+        time. In a process pool this only warms the worker that runs it.
+        """
+        await asyncio.wait_for(self._run(_warm, *self._shared()), timeout)
+
+    def close(self, wait=True):
+        """Shut down the pool, unless it was given by the caller."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._kind:
+            executor.shutdown(wait)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_renderer():
+    """The AsyncRenderer used by render_async, a thread pool unless configured otherwise."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = AsyncRenderer()
+        return _default
+
+
+def configure(*args, **kwargs):
+    """
+    Replace the default renderer with AsyncRenderer(*args, **kwargs) and
+    return it. The previous default is shut down once its renders finish.
+    """
+    global _default
+    renderer = AsyncRenderer(*args, **kwargs)
+    with _default_lock:
+        old, _default = _default, renderer
+    if old is not None:
+        old.close(wait=False)
+    return renderer
+
+
+async def render_async(text, config=None, formats=None, timeout=None):
+    """Render a document with the default renderer. See AsyncRenderer.render."""
+    return await default_renderer().render(text, config, formats, timeout)
+
+
+_process_cache = None
+
+
+def _init_process(cache_args):
+    global _process_cache
+    if cache_args is not None:
+        from literate.cache import RenderCache
+        _process_cache = RenderCache(*cache_args)
+
+
+def _render_document(text, config, formats, cache, registry):
+    if cache is None:
+        cache = _process_cache
+    return Corpus(text, config, formats, cache, registry).render()
+
+
+def _render_code(code, lang, config, formats, cache, registry):
+    if cache is None:
+        cache = _process_cache
+    config = literate.default_config + config
+    renderer = (registry or default_registry).get(lang, config, (formats or {}).get(lang), cache)
+    return renderer.render(CodeRegion(None, 0, len(code), {'lang': lang}, code))
+
+
+def _warm(cache, registry):
+    if cache is None:
+        cache = _process_cache
+    config = literate.default_config
+    for lang in config.renderers:
+        (registry or default_registry).get(lang, config, None, cache).lexer
@@ -0,0 +1,191 @@
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+import literate
+from literate import utils
+
+#: Part of every cache key; bump it whenever a change to the code alters the
+#: rendered output, so that entries rendered by older versions are not served
+RENDER_VERSION = 2
+
+#: The access time of an entry is only refreshed by a hit once it is older
+#: than this many seconds, so that a warm render does not write on every hit
+ATIME_RESOLUTION = 60 * 60
+
+# The part of the cache key shared by every region of a renderer, by renderer.
+# The registry builds a new renderer when a format file changes, so an entry
+# only goes stale if the format of a renderer is replaced
+_prefixes = weakref.WeakKeyDictionary()
+
+
+def default_cache_dir():
+    """The directory used for the render cache when none is given."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'literate')
+
+
+class RenderCache(object):
+    """
+    Persistent, content-addressed cache of rendered code regions.
+
+    Entries live in an SQLite database inside the cache directory, so several
+    lit processes can read and write the same cache concurrently. Entries are
+    keyed by a hash of everything that affects the rendered output, and the
+    least recently used entries are evicted once the cache grows past
+    max_size bytes. Any database error is treated as a cache miss.
+    """
+
+    filename = 'render-cache.sqlite'
+
+    def __init__(self, directory=None, max_size=64 * 1024 * 1024, timeout=30.0):
+        self.directory = directory or default_cache_dir()
+        self.path = os.path.join(self.directory, self.filename)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite connections must not be shared across threads or forks
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        try:
+            if conn.execute('PRAGMA journal_mode=WAL').fetchone()[0].lower() == 'wal':
+                # Only the last transactions can be lost on power failure, never
+                # the integrity of the database
+                conn.execute('PRAGMA synchronous=NORMAL')
+        except sqlite3.Error:
+            pass
+        conn.execute('CREATE TABLE IF NOT EXISTS regions ('
+                     'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                     'size INTEGER NOT NULL, atime REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS regions_atime ON regions (atime)')
+        # The total size of the entries is kept up to date by put, so that it
+        # does not have to be summed over the whole table on every insert
+        conn.execute('CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY, size INTEGER NOT NULL)')
+        if conn.execute('SELECT size FROM usage WHERE id = 0').fetchone() is None:
+            conn.execute('INSERT OR IGNORE INTO usage (id, size) SELECT 0, COALESCE(SUM(size), 0) FROM regions')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def key(renderer, code_region):
+        """Compute the cache key for rendering code_region with renderer."""
+        return utils.digest(_prefix(renderer), sorted(code_region.options.items()), code_region.text)
+
+    def get(self, key):
+        """Return the cached text for key, or None on a miss."""
+        try:
+            conn = self._connection()
+            row = conn.execute('SELECT value, atime FROM regions WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[1] < time.time() - ATIME_RESOLUTION:
+                self._touch(conn, key)
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return utils.native_str(row[0])
+
+    def _touch(self, conn, key):
+        """Refresh the access time of key, unless another process holds the write lock."""
+        # The access time is only a hint for eviction, so rather than wait for
+        # the lock it is left for a later hit to refresh
+        conn.execute('PRAGMA busy_timeout = 0')
+        try:
+            conn.execute('UPDATE regions SET atime = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.execute('PRAGMA busy_timeout = {:d}'.format(int(self.timeout * 1000)))
+
+    def put(self, key, value):
+        """Store value under key, evicting old entries if the cache is too large."""
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                old = conn.execute('SELECT size FROM regions WHERE key = ?', (key,)).fetchone()
+                conn.execute('INSERT OR REPLACE INTO regions (key, value, size, atime) VALUES (?, ?, ?, ?)',
+                             (key, utils.to_text(value), len(value), time.time()))
+                total = conn.execute('SELECT size FROM usage WHERE id = 0').fetchone()[0]
+                total += len(value) - (old[0] if old else 0)
+                if total > self.max_size:
+                    total = self._evict(conn, total)
+                conn.execute('UPDATE usage SET size = ? WHERE id = 0', (total,))
+                conn.execute('COMMIT')
+            except:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn, total):
+        """Remove the least recently used entries until total fits, and return the new total."""
+        stale = []
+        for key, size in conn.execute('SELECT key, size FROM regions ORDER BY atime, rowid'):
+            if total <= self.max_size:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany('DELETE FROM regions WHERE key = ?', stale)
+        return total
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM regions')
+                conn.execute('UPDATE usage SET size = 0 WHERE id = 0')
+                conn.execute('COMMIT')
+            except:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            pass
+
+    def __repr__(self):
+        return "RenderCache<path: {}, hits: {}, misses: {}>".format(self.path, self.hits, self.misses)
+
+
+def _prefix(renderer):
+    """A digest of everything besides the code region that affects the output of renderer."""
+    entry = _prefixes.get(renderer)
+    if entry is None or entry[0] != RENDER_VERSION or entry[1] is not renderer.format:
+        # The lexers come from pygments, so its version affects the output too;
+        # it is already loaded by the time anything is rendered
+        import pygments
+        cls = type(renderer)
+        prefix = utils.digest(
+            literate.__version__,
+            RENDER_VERSION,
+            pygments.__version__,
+            '{}.{}'.format(cls.__module__, cls.__name__),
+            renderer.format)
+        entry = _prefixes[renderer] = (RENDER_VERSION, renderer.format, prefix)
+    return entry[2]
@@ -1,71 +1,129 @@
-from collections import Mapping, defaultdict
-import json
-import os
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 from literate import utils
 
 
 class Config(Mapping):
     """
-    Dictionary-like object that forgives missing key accesses, even recursively.
+    Immutable dictionary-like object that forgives missing key accesses, even
+    recursively. Nested mappings are converted to Configs once, when the
+    Config is built, so lookups return shared views instead of copies and a
+    Config can be read from any number of threads.
     """
 
+    __slots__ = ('_data',)
+
     @staticmethod
     def load(filename, **kwargs):
         return Config(utils.load_json(filename, **kwargs))
 
     def __init__(self, other=None, filename=None, **kwargs):
-        def mkdict():
-            return defaultdict(mkdict)
-        self.config = defaultdict(mkdict)
+        data = {}
         if filename:
-            self._update(utils.load_json(filename, **kwargs))
+            _merge(data, utils.load_json(filename, **kwargs))
         if other:
-            self._update(other)
-
-    def _update_dict(self, dst, src):
-        for k, v in src.iteritems():
-            if isinstance(v, Mapping) and isinstance(dst[k], Mapping):
-                r = self._update_dict(dst[k], v)
-                dst[k] = r
-            else:
-                dst[k] = v
-        return dst
-
-    def _update(self, other):
-        if isinstance(other, Config):
-            other = other.config
-        self._update_dict(self.config, other)
+            _merge(data, other)
+        object.__setattr__(self, '_data', data)
 
     def copy(self):
-        return Config(self)
+        return self
 
     def __add__(self, other):
-        cfg = Config(self)
-        if other:
-            cfg._update(other)
-        return cfg
+        if not other:
+            return self
+        return _frozen(_merge(_merge({}, self), other))
 
     def __len__(self):
-        return self.config
+        return len(self._data)
 
     def __iter__(self):
-        return iter(self.config)
+        return iter(self._data)
+
+    def __bool__(self):
+        return len(self._data) > 0
 
-    def __nonzero__(self):
-        return len(self.config) > 0
+    __nonzero__ = __bool__
 
     def __contains__(self, item):
-        return item in self.config
+        return item in self._data
 
     def __getitem__(self, key):
-        val = self.config[str(key)]
-        if hasattr(val, 'keys'):
-            subconfig = Config(val)
-            return subconfig
-        return val
+        try:
+            return self._data[key]
+        except KeyError:
+            return self._data.get(str(key), _empty)
 
     def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
         return self[item]
 
+    def __setattr__(self, key, value):
+        raise AttributeError("Config is immutable")
+
+    def __delattr__(self, item):
+        raise AttributeError("Config is immutable")
+
+    def __reduce__(self):
+        return _frozen, (self._data,)
+
     def __repr__(self):
-        return repr(self.config)
\ No newline at end of file
+        return repr(self._data)
+
+
+class LazyConfig(Config):
+    """
+    A Config that loads its contents from a JSON file the first time they are
+    needed, so that merely importing a module that defines one stays cheap.
+    """
+
+    __slots__ = ('_source',)
+
+    def __init__(self, filename, **kwargs):
+        object.__setattr__(self, '_source', (filename, kwargs))
+
+    def __getattr__(self, item):
+        if item == '_data':
+            filename, kwargs = self._source
+            data = _merge({}, utils.load_json(filename, **kwargs))
+            object.__setattr__(self, '_data', data)
+            return data
+        return Config.__getattr__(self, item)
+
+
+def _frozen(data):
+    """Wrap an already-frozen dictionary in a Config without copying it."""
+    config = Config.__new__(Config)
+    object.__setattr__(config, '_data', data)
+    return config
+
+
+def _freeze(value):
+    if isinstance(value, Config):
+        return value
+    if isinstance(value, Mapping):
+        return _frozen(_merge({}, value))
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _merge(dst, src):
+    """Recursively merge src into the plain dictionary dst, freezing the values."""
+    for k, v in src.items():
+        old = dst.get(k)
+        if isinstance(v, Mapping) and (old is None or isinstance(old, Mapping)):
+            if old:
+                v = _frozen(_merge(_merge({}, old), v))
+            else:
+                v = _freeze(v)
+        else:
+            v = _freeze(v)
+        dst[k] = v
+    return dst
+
+
+_empty = Config()
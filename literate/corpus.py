@@ -1,8 +1,26 @@
-import os
+from collections import Counter, namedtuple
+import hashlib
+
 import literate
-import utils
-from literate.config import Config
-from literate.region import CodeRegion, Region
+from literate import stats, utils
+from literate.region import CodeRegion
+from literate.registry import default_registry
+from literate.scanner import parse_options, scan, scan_stream
+
+
+class RenderError(RuntimeError):
+    """
+    Raised when a code region fails to render in a worker process or while
+    streaming.
+    """
+    def __init__(self, index, line, message):
+        super(RenderError, self).__init__(
+            "Failed to render code region {} (line {}): {}".format(index + 1, line, message))
+        self.index = index
+        self.line = line
+
+
+UpdateStats = namedtuple('UpdateStats', 'reused rendered removed')
 
 
 class Corpus(object):
@@ -10,115 +28,250 @@ class Corpus(object):
     A block of text with delimited code sections.
     """
 
-    def __init__(self, text, config=None, formats=None):
+    def __init__(self, text, config=None, formats=None, cache=None, registry=None):
         """
         Initialize a new Corpus with the specified text. If config is not
-        specified, the default config is used.
+        specified, the default config is used. If a RenderCache is given,
+        rendered code regions are looked up in and stored to it. Renderers
+        are shared through the default RendererRegistry unless another
+        registry is given.
         """
         self.config = literate.default_config + config
         self.formats = formats or {}
+        self.cache = cache
+        self.registry = registry or default_registry
+        self._renderers = {}
+        self._fragments = {}
         self._original_text = text
-        self._text = text
+        self._stripped_text = None
+        self._segments = ()
         self._code_regions = []
+        self._region_keys = []
         self._find_code_regions()
 
     def _find_code_regions(self):
-        code_start = self.config.delimiters.begin
-        code_end = self.config.delimiters.end
-
-        start = 0
-        while True:
-            start = self._text.find(code_start, start)
-            if start == -1:
-                return
-            end = self._text.find(code_end, start + 1)
-            if end == -1:
-                raise ValueError("Mismatched code blocks found")
-
-            # Parse out the code delimiters and the options block
-            block_start = start + len(code_start)
-            block_end = end
-            end = end + len(code_end)
-            inner_text = self._text[block_start:block_end]
-            opts, inner_text = parse_options(inner_text)
-
-            # Remove the actual code delimiters from the text
-            self._text = (
-                self._text[:start] +
-                inner_text +
-                self._text[end:])
-            end = start + len(inner_text)
-
-            region = CodeRegion(self, start, len(inner_text), opts)
-            self._code_regions.append(region)
-            start = region.start + region.length
+        delimiters = self.config.delimiters
+        if stats.active is None:
+            self._segments = scan(self._original_text, delimiters.begin, delimiters.end)
+        else:
+            with stats.active.stage('scan'):
+                self._segments = scan(self._original_text, delimiters.begin, delimiters.end)
+        self._code_regions = [CodeRegion.from_segment(self, segment)
+                              for segment in self._segments if segment.is_code]
+        self._region_keys = [_fragment_key(region) for region in self._code_regions]
+
+    def _renderer(self, lang):
+        renderer = self._renderers.get(lang)
+        if renderer is None:
+            renderer = self._renderers[lang] = self.registry.get(
+                lang, self.config, self.formats.get(lang), self.cache)
+        return renderer
 
     def _render_region(self, region):
-        if region not in self.code_regions:
-            raise RuntimeError("Region not scanned")
-        lang = region.options.get('lang')
-        renderer_name = self.config.renderers[lang]
-        if not renderer_name:
-            raise RuntimeError("No language specified for code block")
-        renderer_cls = utils.get_class(renderer_name)
-        if not renderer_cls:
-            raise RuntimeError("Invalid renderer: {}".format(renderer_name or '(none)'))
-
-        format = Config(utils.load_json(os.path.join('languages', lang + '.json'), True))
-        extra_format = self.formats.get(lang)
-        if extra_format:
-            format += extra_format
-        renderer = renderer_cls(self.config, format)
-        text = renderer.render(region)
-        self._text = (
-            self._text[:region.start] +
-            text +
-            self._text[region.start + region.length:])
-        self.code_regions.remove(region)
-        new_region = Region(self, region.start, len(text))
-        self._update_regions(new_region.start, new_region.length - region.length)
-
-    def _update_regions(self, after, offset):
-        for region in self.code_regions:
-            if region.start > after:
-                region.start += offset
+        return self._renderer(region.options.get('lang')).render(region)
 
     @property
     def original_text(self):
         return self._original_text
 
+    @property
+    def _text(self):
+        """The text with every delimiter stripped, which is only built if asked for."""
+        if self._stripped_text is None:
+            self._stripped_text = ''.join(segment.text for segment in self._segments)
+        return self._stripped_text
+
+    @property
+    def segments(self):
+        """The immutable tuple of text and code segments making up the document."""
+        return self._segments
+
     @property
     def code_regions(self):
         return self._code_regions
 
-    def render(self):
-        rendered_corpus = Corpus(self._original_text, self.config, self.formats)
-        for region in rendered_corpus.code_regions[:]:
-            rendered_corpus._render_region(region)
-        return rendered_corpus._text
+    def render(self, jobs=None):
+        """
+        Render the document. Prose segments are passed through untouched and
+        each code region is replaced by its rendered form; the pieces are
+        joined once at the end. If jobs is more than 1, code regions are
+        rendered in a pool of that many processes (0 means one per CPU).
+        Rendered regions are remembered, so rendering again is cheap.
+        """
+        self._render_missing(jobs)
+        keys = iter(self._region_keys)
+        fragments = []
+        for segment in self._segments:
+            if segment.is_code:
+                fragments.append(self._fragments[next(keys)])
+            else:
+                fragments.append(segment.text)
+        return ''.join(fragments)
+
+    def update(self, text, config=None, formats=None, jobs=None):
+        """
+        Replace the document with new text and render it incrementally. Code
+        regions whose text and options match a region of the previous version
+        reuse its output; only new or changed regions are rendered. If config
+        or formats are given they replace the current ones, and regions of
+        languages whose effective format changed are rendered again.
+        Returns an UpdateStats with the number of code regions whose output was
+        reused, the number of code regions rendered and the number of code
+        regions of the previous version that are gone. Identical regions are
+        only rendered once, but each of them is counted.
+        """
+        self._refresh_formats(config, formats)
+        old_keys = self._region_keys
+        self._original_text = text
+        self._stripped_text = None
+        self._find_code_regions()
+        keys = set(self._region_keys)
+        self._fragments = dict((k, v) for k, v in self._fragments.items() if k in keys)
+        reused = sum(1 for key in self._region_keys if key in self._fragments)
+        self._render_missing(jobs)
+        removed = Counter(old_keys) - Counter(self._region_keys)
+        return UpdateStats(reused, len(self._region_keys) - reused, sum(removed.values()))
+
+    def _refresh_formats(self, config=None, formats=None):
+        """
+        Apply a new config or formats and forget the rendered regions of every
+        language whose renderer or merged format is no longer the same.
+        """
+        langs = set(dict(key[1]).get('lang') for key in self._fragments)
+        before = dict((lang, self._format_key(lang)) for lang in langs)
+        if config is not None:
+            self.config = literate.default_config + config
+        if formats is not None:
+            self.formats = formats
+        self.registry.refresh()
+        self._renderers = {}
+        stale = set(lang for lang in langs if self._format_key(lang) != before[lang])
+        if stale:
+            self._fragments = dict((k, v) for k, v in self._fragments.items()
+                                   if dict(k[1]).get('lang') not in stale)
+
+    def _format_key(self, lang):
+        try:
+            renderer = self._renderer(lang)
+        except Exception:
+            return None
+        cls = type(renderer)
+        return '{}.{}'.format(cls.__module__, cls.__name__), utils.digest(renderer.format)
+
+    def _render_missing(self, jobs=None):
+        """Render every code region that has no rendered output yet, returning how many were rendered."""
+        missing = []
+        seen = set()
+        for index, key in enumerate(self._region_keys):
+            if key not in self._fragments and key not in seen:
+                seen.add(key)
+                missing.append(index)
+        if jobs == 0:
+            import multiprocessing
+            jobs = multiprocessing.cpu_count()
+        if jobs and jobs > 1 and len(missing) > 1:
+            rendered = self._render_parallel(jobs, missing)
+            for index in missing:
+                self._fragments[self._region_keys[index]] = rendered[index]
+        else:
+            for index in missing:
+                self._fragments[self._region_keys[index]] = self._render_region(self._code_regions[index])
+        return len(missing)
+
+    def _render_parallel(self, jobs, indices):
+        """
+        Render the code regions at the given indices in a process pool and
+        return a dictionary of the results by index. Cache lookups happen here,
+        so only misses are sent to the workers, and the largest regions are
+        scheduled first.
+        """
+        regions = self._code_regions
+        results = {}
+        keys = {}
+        for index in indices:
+            if self.cache is None:
+                break
+            region = regions[index]
+            try:
+                renderer = self._renderer(region.options.get('lang'))
+            except Exception:
+                # Leave it to the worker to fail and report the region
+                continue
+            keys[index] = self.cache.key(renderer, region)
+            text = self.cache.get(keys[index])
+            if text is not None:
+                results[index] = text
+
+        pending = sorted((i for i in indices if i not in results),
+                         key=lambda i: regions[i].length, reverse=True)
+        if not pending:
+            return results
+        import multiprocessing
+        pool = multiprocessing.Pool(min(jobs, len(pending)), _init_worker, (self.config, self.formats))
+        try:
+            tasks = [(i, pool.apply_async(_render_segment, (regions[i].segment,))) for i in pending]
+            for index, task in tasks:
+                text, error = task.get()
+                if error is not None:
+                    raise RenderError(index, regions[index].line, error)
+                results[index] = text
+                if index in keys:
+                    self.cache.put(keys[index], text)
+        finally:
+            pool.terminate()
+            pool.join()
+        return results
 
 
-def parse_options(text):
+def render_stream(infile, outfile, config=None, formats=None, cache=None, registry=None):
     """
-    Attempt to parse a comma-delimited key-value pair surrounded by braces,
-    and return the resulting dictionary. Failures result in {}.
+    Render a document from infile to outfile without holding it in memory.
+    The input is scanned incrementally; prose is written as soon as it is
+    read and each code region as soon as it is rendered, so memory use is
+    bounded by the largest code region rather than the document.
     """
-    nl = text.find('\n')
-    brace = text.find('{')
-    if brace == -1 or brace > nl:
-        return {}, text[nl + 1:]
-
-    text = text[brace:]
-    end = text.find('}')
-    result = {}
-    if end != -1:
-        # We actually want to skip the entire line that the code block is on
-        nl = text.find('\n', end)
-        opt_string = text[1:end]
-        opts = opt_string.split(',')
-        for opt in opts:
-            if '=' not in opt:
-                continue
-            k, v = opt.split('=')
-            result[k] = v
-    return result, text[nl + 1:]
\ No newline at end of file
+    config = literate.default_config + config
+    formats = formats or {}
+    registry = registry or default_registry
+    index = 0
+    for line, segment in scan_stream(infile, config.delimiters.begin, config.delimiters.end):
+        if segment.is_code:
+            lang = segment.options.get('lang')
+            try:
+                renderer = registry.get(lang, config, formats.get(lang), cache)
+                text = renderer.render(CodeRegion.from_segment(None, segment))
+            except Exception as e:
+                raise RenderError(index, line, e)
+            index += 1
+        else:
+            text = segment.text
+        outfile.write(text)
+        outfile.flush()
+
+
+def _fragment_key(region):
+    # A digest of the text rather than the text itself, so that the keys do
+    # not hold a copy of every code region
+    text = region.text
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return hashlib.sha1(text).digest(), tuple(sorted(region.options.items()))
+
+
+_worker_state = {}
+
+
+def _init_worker(config, formats):
+    _worker_state['config'] = config
+    _worker_state['formats'] = formats
+
+
+def _render_segment(segment):
+    """Render one code segment inside a worker process, returning (text, error)."""
+    try:
+        lang = segment.options.get('lang')
+        formats = _worker_state['formats']
+        renderer = default_registry.get(lang, _worker_state['config'], formats.get(lang))
+        return renderer.render(CodeRegion.from_segment(None, segment)), None
+    except Exception as e:
+        return None, '{}: {}'.format(type(e).__name__, e)
@@ -1,15 +1,152 @@
 import argparse
 from collections import defaultdict
+import errno
+import fnmatch
+import os
 import sys
 
-from literate import Corpus, Config
+from literate import Corpus, Config, render_stream, stats, utils
 from literate.utils import load_json
 
 
-def render(infile, outfile, config, formats):
+def render(infile, outfile, config, formats, cache=None, jobs=None, stream=False):
+    if stream:
+        render_stream(infile, outfile, config, formats, cache)
+        return
     text = infile.read()
-    corpus = Corpus(text, config, formats)
-    outfile.write(corpus.render())
+    corpus = Corpus(text, config, formats, cache)
+    outfile.write(corpus.render(jobs))
+
+
+def render_client(infile, outfile, config, formats, cache=None, jobs=None, socket_path=None, timeout=60.0):
+    """
+    Render on a running render server, falling back to rendering in this
+    process if no server is listening or it does not reply within timeout
+    seconds.
+    """
+    from literate.server import ServerUnavailable, render_remote
+    text = infile.read()
+    try:
+        output = render_remote(text, config, formats, socket_path, timeout)
+    except ServerUnavailable:
+        output = Corpus(text, config, formats, cache).render(jobs)
+    outfile.write(output)
+
+
+def render_file(inpath, outpath, config, formats, cache=None, jobs=None):
+    """Render the file at inpath into the file at outpath, creating directories as needed."""
+    with utils.open_text(inpath) as infile:
+        text = infile.read()
+    output = Corpus(text, config, formats, cache).render(jobs)
+    dirname = os.path.dirname(outpath)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    with utils.open_text(outpath, 'w') as outfile:
+        outfile.write(output)
+
+
+def find_inputs(paths, pattern, output_dir=None, suffix=None):
+    """
+    Expand input files and directories into a list of (input, output) path
+    pairs. Directories are searched recursively for files matching pattern.
+    Outputs go into output_dir, mirroring the layout of any input directory,
+    or next to the input with its extension replaced by suffix.
+    """
+    def output_path(path, relpath):
+        if output_dir:
+            return os.path.join(output_dir, relpath)
+        return os.path.splitext(path)[0] + suffix
+
+    def is_output(path):
+        if output_dir:
+            return os.path.abspath(path).startswith(os.path.abspath(output_dir) + os.sep)
+        return path.endswith(suffix)
+
+    pairs = []
+    for path in paths:
+        if not os.path.isdir(path):
+            pairs.append((path, output_path(path, os.path.basename(path))))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(fnmatch.filter(files, pattern)):
+                filename = os.path.join(root, name)
+                if not is_output(filename):
+                    pairs.append((filename, output_path(filename, os.path.relpath(filename, path))))
+    return pairs
+
+
+def render_batch(pairs, config, formats, cache=None, jobs=None, report=None):
+    """
+    Render every (input, output) pair, spreading the files across a pool of
+    jobs processes if jobs is more than 1. report is called with the input,
+    output and error message (None on success) of each file as it finishes.
+    Returns the number of files that failed.
+    """
+    import multiprocessing
+    failures = 0
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
+    if jobs and jobs > 1 and len(pairs) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(pairs)), _init_batch_worker, (config, formats, cache))
+        try:
+            results = pool.imap_unordered(_render_batch_file, pairs)
+            for inpath, outpath, error in results:
+                failures += error is not None
+                if report:
+                    report(inpath, outpath, error)
+        finally:
+            pool.terminate()
+            pool.join()
+        return failures
+
+    _init_batch_worker(config, formats, cache)
+    for pair in pairs:
+        inpath, outpath, error = _render_batch_file(pair)
+        failures += error is not None
+        if report:
+            report(inpath, outpath, error)
+    return failures
+
+
+_batch_state = {}
+
+
+def _init_batch_worker(config, formats, cache):
+    _batch_state.update(config=config, formats=formats, cache=cache)
+
+
+def _render_batch_file(pair):
+    inpath, outpath = pair
+    if os.path.abspath(inpath) == os.path.abspath(outpath):
+        return inpath, outpath, 'Refusing to overwrite the input file'
+    try:
+        render_file(inpath, outpath, _batch_state['config'], _batch_state['formats'], _batch_state['cache'])
+    except Exception as e:
+        return inpath, outpath, '{}: {}'.format(type(e).__name__, e)
+    return inpath, outpath, None
+
+
+def _open(parser, path, mode='r'):
+    """Open a file given on the command line, exiting with a usage error if it cannot be opened."""
+    try:
+        return utils.open_text(path, mode)
+    except (IOError, OSError) as e:
+        parser.error("can't open '{}': {}".format(path, e.strerror or e))
+
+
+def _report(inpath, outpath, error):
+    if error is None:
+        sys.stderr.write('{} -> {}\n'.format(inpath, outpath))
+    else:
+        sys.stderr.write('{}: error: {}\n'.format(inpath, error))
+
+
+def _report_watch(stats, error):
+    if error is None:
+        sys.stderr.write('updated: {} regions rendered, {} reused\n'.format(stats.rendered, stats.reused))
+    else:
+        sys.stderr.write('error: {}\n'.format(error))
 
 
 def main():
@@ -26,21 +163,118 @@ def main():
             cfg = Config.load(filename)
         except (IOError, ValueError):
             raise argparse.ArgumentError('--format', 'Failed to load format file {}'.format(parts[1]))
-        return lang, cfg
+        return lang, filename, cfg
 
     def config(str):
-        return Config.load(str)
+        return str, Config.load(str)
 
     parser = argparse.ArgumentParser(description='Literate code preprocessor')
-    parser.add_argument('infile', nargs='?', type=argparse.FileType('r'), default=sys.stdin)
-    parser.add_argument('-o', dest='outfile', nargs='?', type=argparse.FileType('w'), default=sys.stdout)
+    parser.add_argument('infiles', nargs='*', metavar='infile')
+    parser.add_argument('-o', dest='outfile')
+    parser.add_argument('--output-dir')
+    parser.add_argument('--suffix')
+    parser.add_argument('--pattern', default='*.tex')
     parser.add_argument('--config', type=config)
     parser.add_argument('--format', action='append', type=format, default=[])
+    parser.add_argument('--cache-dir')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('-j', '--jobs', type=int)
+    parser.add_argument('--serve', action='store_true')
+    parser.add_argument('--client', action='store_true')
+    parser.add_argument('--socket')
+    parser.add_argument('--stream', action='store_true')
+    parser.add_argument('--watch', action='store_true')
+    parser.add_argument('--interval', type=float, default=1.0)
+    parser.add_argument('--stats', action='store_true')
+    parser.add_argument('--stats-json', action='store_true')
+    parser.add_argument('--slowest', type=int, default=5)
+    parser.add_argument('--profile', metavar='FILE')
 
     args = parser.parse_args()
 
+    if args.stats or args.stats_json:
+        # Stats are only collected in this process
+        args.jobs = None
+        stats.enable()
+    try:
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(_run, parser, args)
+            finally:
+                profiler.dump_stats(args.profile)
+        return _run(parser, args)
+    finally:
+        collected = stats.disable()
+        if collected is not None:
+            sys.stderr.write(collected.format(args.slowest, args.stats_json) + '\n')
+
+
+def _run(parser, args):
+    config_path, config = args.config or (None, None)
     formats = defaultdict(Config)
-    for lang, fmt in args.format:
+    for lang, filename, fmt in args.format:
         formats[lang] += fmt
 
-    render(args.infile, args.outfile, args.config, formats)
\ No newline at end of file
+    cache = None
+    if not args.no_cache:
+        from literate.cache import RenderCache
+        cache = RenderCache(args.cache_dir)
+
+    if args.serve:
+        from literate.server import serve
+        serve(args.socket, cache)
+        return 0
+
+    batch = args.output_dir or args.suffix
+    if args.watch:
+        if batch or args.client or len(args.infiles) != 1 or not args.outfile or '-' in (args.infiles[0], args.outfile):
+            parser.error('--watch requires a single input file and -o')
+        from literate.watch import Watcher
+        watcher = Watcher(args.infiles[0], args.outfile, config_path,
+                          [(lang, filename) for lang, filename, fmt in args.format], cache, args.jobs)
+        try:
+            watcher.run(args.interval, _report_watch)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if not batch:
+        if len(args.infiles) > 1 or (args.infiles and os.path.isdir(args.infiles[0])):
+            parser.error('--output-dir or --suffix is required with several input files or a directory')
+        inpath = args.infiles[0] if args.infiles else '-'
+        outpath = args.outfile or '-'
+        infile = utils.std_text('stdin') if inpath == '-' else _open(parser, inpath)
+        try:
+            outfile = utils.std_text('stdout') if outpath == '-' else _open(parser, outpath, 'w')
+        except SystemExit:
+            infile.close()
+            raise
+        try:
+            if args.client:
+                render_client(infile, outfile, config, formats, cache, args.jobs, args.socket)
+            else:
+                render(infile, outfile, config, formats, cache, args.jobs, args.stream)
+        finally:
+            for f in (infile, outfile):
+                if f not in (sys.stdin, sys.stdout):
+                    f.close()
+        return 0
+
+    if args.outfile:
+        parser.error('-o cannot be combined with --output-dir or --suffix')
+    if not args.infiles:
+        parser.error('no input files given')
+    for path in args.infiles:
+        if not os.path.exists(path):
+            parser.error("can't open '{}': {}".format(path, os.strerror(errno.ENOENT)))
+    pairs = find_inputs(args.infiles, args.pattern, args.output_dir, args.suffix)
+    if not pairs:
+        hint = ' (files ending in {} are taken to be outputs)'.format(args.suffix) if args.suffix else ''
+        parser.error('no input files matching {} found{}'.format(args.pattern, hint))
+    failures = render_batch(pairs, config, formats, cache, args.jobs, _report)
+    if failures:
+        sys.stderr.write('{} of {} files failed\n'.format(failures, len(pairs)))
+        return 1
+    return 0
\ No newline at end of file
@@ -3,23 +3,31 @@ from collections import defaultdict
 
 class Region(object):
     """
-    Represents a region inside a Corpus.
+    Represents a region inside a Corpus. A region is a view of a buffer shared
+    with the rest of the document: the corpus text, or the given text. It only
+    holds its position in the buffer, and its text is sliced out whenever it is
+    read.
     """
-    def __init__(self, corpus, start, length):
+    __slots__ = ('_corpus', '_start', '_length', '_buffer', '_pos')
+
+    def __init__(self, corpus, start, length, text=None):
         self._corpus = corpus
         self._start = start
-        self._text = corpus._text[start:start + length]
+        self._length = length
+        self._buffer = text
+        self._pos = 0 if text is not None else start
 
     def __repr__(self):
         return "Region<start: {}, length: {}>".format(self.start, self.length)
 
     @property
     def length(self):
-        return len(self.text)
+        return self._length
 
     @property
     def text(self):
-        return self._text
+        buffer = self._corpus._text if self._buffer is None else self._buffer
+        return buffer[self._pos:self._pos + self._length]
 
     @property
     def start(self):
@@ -28,18 +36,29 @@ class Region(object):
     @start.setter
     def start(self, value):
         self._start = value
-        self._text = self._corpus._text[value:value + self.length]
+        self._buffer = None
+        self._pos = value
 
 
 class CodeRegion(Region):
     """
     Represents a code region inside a Corpus, including its options.
     """
-    def __init__(self, corpus, start, length, opts):
-        super(CodeRegion, self).__init__(corpus, start, length)
+    __slots__ = ('_options', '_segment')
+
+    def __init__(self, corpus, start, length, opts, text=None):
+        super(CodeRegion, self).__init__(corpus, start, length, text)
         self._options = defaultdict(str)
         self._options.update(opts)
-        self._offset = 0
+        self._segment = None
+
+    @classmethod
+    def from_segment(cls, corpus, segment):
+        """Create a CodeRegion viewing the text of a code segment produced by the scanner."""
+        region = cls(corpus, segment.offset, segment.length, segment.options, segment.source)
+        region._pos = segment.start - segment.base
+        region._segment = segment
+        return region
 
     def __repr__(self):
         return "CodeRegion<start: {}, length: {}, opts: {}>".format(
@@ -50,5 +69,13 @@ class CodeRegion(Region):
         return self._options
 
     @property
-    def text(self):
-        return super(CodeRegion, self).text[self._offset:]
\ No newline at end of file
+    def segment(self):
+        """The scanner segment this region was built from, if any."""
+        return self._segment
+
+    @property
+    def line(self):
+        """The line of the original document on which the code starts, if known."""
+        if self._segment is None:
+            return None
+        return self._segment.line
\ No newline at end of file
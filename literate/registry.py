@@ -0,0 +1,88 @@
+import os
+import threading
+
+from literate import utils
+from literate.config import Config
+
+
+class RendererRegistry(object):
+    """
+    Builds each renderer once per language, renderer class, config and extra
+    format, and hands the same instance out for every code region that needs
+    it. Language format files are read once and remembered along with their
+    modification times so that stale entries can be dropped with refresh().
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._renderers = {}
+        self._formats = {}
+
+    @staticmethod
+    def format_path(lang):
+        """The path of the format file for a language."""
+        return utils.resource_path(os.path.join('languages', lang + '.json'))
+
+    def language_format(self, lang):
+        """Return the format for a language as loaded from its format file."""
+        with self._lock:
+            entry = self._formats.get(lang)
+            if entry is None:
+                path = self.format_path(lang)
+                mtime = _mtime(path)
+                entry = self._formats[lang] = (mtime, Config(utils.load_json(path)))
+            return entry[1]
+
+    def get(self, lang, config, extra_format=None, cache=None):
+        """
+        Return a renderer for the given language. config must be the fully
+        merged config, as it is used to look up the renderer class.
+        """
+        renderer_name = config.renderers[lang]
+        if not renderer_name:
+            raise RuntimeError("No language specified for code block")
+        key = (lang, renderer_name, utils.digest(config), utils.digest(extra_format), cache)
+        with self._lock:
+            renderer = self._renderers.get(key)
+            if renderer is None:
+                renderer_cls = utils.get_class(renderer_name)
+                if not renderer_cls:
+                    raise RuntimeError("Invalid renderer: {}".format(renderer_name or '(none)'))
+                format = self.language_format(lang)
+                if extra_format:
+                    format += extra_format
+                renderer = self._renderers[key] = renderer_cls(config, format, cache)
+            return renderer
+
+    def invalidate(self, lang=None):
+        """Forget the renderers and formats for a language, or for every language."""
+        with self._lock:
+            if lang is None:
+                self._renderers.clear()
+                self._formats.clear()
+                return
+            self._formats.pop(lang, None)
+            for key in [k for k in self._renderers if k[0] == lang]:
+                del self._renderers[key]
+
+    def refresh(self):
+        """
+        Invalidate every language whose format file has changed on disk since it
+        was loaded, and return the list of invalidated languages.
+        """
+        with self._lock:
+            stale = [lang for lang, (mtime, _) in self._formats.items()
+                     if _mtime(self.format_path(lang)) != mtime]
+            for lang in stale:
+                self.invalidate(lang)
+            return stale
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+default_registry = RendererRegistry()
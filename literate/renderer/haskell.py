@@ -20,7 +20,8 @@ class HaskellRenderer(PolyTableRenderer):
     def create_lexer(self):
         from pygments.filters import TokenMergeFilter
         from pygments.lexers.haskell import HaskellLexer
-        l = HaskellLexer()
+        from literate.renderer.lexer import combined
+        l = combined(HaskellLexer)()
         l.add_filter(TokenMergeFilter())
         return l
 
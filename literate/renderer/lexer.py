@@ -0,0 +1,164 @@
+import re
+
+from pygments.lexer import RegexLexer
+from pygments.token import Error, Text, Whitespace, _TokenType
+
+# Newer versions of pygments emit the newline that resets a line with no
+# matching rule as Whitespace rather than Text; follow whichever is installed
+_eol_token = Whitespace if 'Whitespace' in RegexLexer.get_tokens_unprocessed.__code__.co_names else Text
+
+
+class CombinedRegexLexerMixin(object):
+    """
+    Mixin for a pygments RegexLexer that matches all the rules of a state
+    with a single regular expression instead of trying them one at a time.
+
+    The rules of every state are joined into one alternation, in order, with
+    each rule wrapped in a capturing group. A regex alternation tries its
+    branches in order at the given position, so the branch that matches is
+    exactly the rule a RegexLexer would have picked, and the token stream is
+    the same. Rules that cannot be combined safely (numbered backreferences,
+    or patterns that do not compile once wrapped) are tried on their own,
+    in their original place.
+    """
+
+    #: Maximum number of groups in one combined pattern; sre in Python 2 allows 100
+    max_groups = 99
+
+    @classmethod
+    def combined_tokens(cls):
+        """The combined rule tables of every state, built once per class."""
+        tables = cls.__dict__.get('_combined_tokens')
+        if tables is None:
+            tables = dict((state, _combine(rules, cls.max_groups))
+                          for state, rules in cls._tokens.items())
+            cls._combined_tokens = tables
+        return tables
+
+    def get_tokens_unprocessed(self, text, stack=('root',)):
+        """
+        Split text into (index, tokentype, value) triples, like
+        RegexLexer.get_tokens_unprocessed.
+        """
+        pos = 0
+        tokendefs = self.combined_tokens()
+        statestack = list(stack)
+        statetokens = tokendefs[statestack[-1]]
+        while 1:
+            for match, rules, rule in statetokens:
+                m = match(text, pos)
+                if m:
+                    if rules is None:
+                        rexmatch, action, new_state = rule
+                    else:
+                        rexmatch, action, new_state = rules[m.lastindex]
+                    if action is not None:
+                        if type(action) is _TokenType:
+                            yield pos, action, m.group()
+                        else:
+                            # Callbacks get the match of the rule on its own,
+                            # with the group numbers they expect
+                            for item in action(self, m if rules is None else rexmatch(text, pos)):
+                                yield item
+                    pos = m.end()
+                    if new_state is not None:
+                        # state transition
+                        if isinstance(new_state, tuple):
+                            for state in new_state:
+                                if state == '#pop':
+                                    if len(statestack) > 1:
+                                        statestack.pop()
+                                elif state == '#push':
+                                    statestack.append(statestack[-1])
+                                else:
+                                    statestack.append(state)
+                        elif isinstance(new_state, int):
+                            # pop, but keep at least one state on the stack
+                            if abs(new_state) >= len(statestack):
+                                del statestack[1:]
+                            else:
+                                del statestack[new_state:]
+                        elif new_state == '#push':
+                            statestack.append(statestack[-1])
+                        else:
+                            assert False, "wrong state def: %r" % new_state
+                        statetokens = tokendefs[statestack[-1]]
+                    break
+            else:
+                try:
+                    if text[pos] == '\n':
+                        # at EOL, reset state to "root"
+                        statestack = ['root']
+                        statetokens = tokendefs['root']
+                        yield pos, _eol_token, u'\n'
+                        pos += 1
+                        continue
+                    yield pos, Error, text[pos]
+                    pos += 1
+                except IndexError:
+                    break
+
+
+_combined_classes = {}
+
+
+def combined(lexer_cls):
+    """Return a subclass of a RegexLexer class that uses CombinedRegexLexerMixin."""
+    cls = _combined_classes.get(lexer_cls)
+    if cls is None:
+        cls = _combined_classes[lexer_cls] = type(
+            'Combined' + lexer_cls.__name__, (CombinedRegexLexerMixin, lexer_cls), {})
+    return cls
+
+
+_backreference = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def _combine(rules, max_groups):
+    """
+    Turn a list of (rexmatch, action, new_state) rules into a list of
+    (match, rules_by_group, rule) triples. match is either a combined pattern
+    and rules_by_group maps the group of each alternative to its rule, or the
+    match of a single rule, with rules_by_group None.
+    """
+    tables = []
+    chunk = []
+    groups = 0
+    flags = None
+
+    def flush():
+        if chunk:
+            tables.extend(_compile_chunk(chunk, flags))
+            del chunk[:]
+
+    for rule in rules:
+        regex = rule[0].__self__
+        if _backreference.search(regex.pattern):
+            flush()
+            tables.append((rule[0], None, rule))
+            groups = 0
+            continue
+        if chunk and (regex.flags != flags or groups + regex.groups + 1 > max_groups):
+            flush()
+            groups = 0
+        flags = regex.flags
+        chunk.append(rule)
+        groups += regex.groups + 1
+    flush()
+    return tables
+
+
+def _compile_chunk(rules, flags):
+    parts = []
+    by_group = {}
+    group = 1
+    for rule in rules:
+        regex = rule[0].__self__
+        parts.append('(' + regex.pattern + ')')
+        by_group[group] = rule
+        group += regex.groups + 1
+    try:
+        combined = re.compile('|'.join(parts), flags)
+    except (re.error, AssertionError, OverflowError):
+        return [(rule[0], None, rule) for rule in rules]
+    return [(combined.match, by_group, None)]
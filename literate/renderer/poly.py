@@ -1,13 +1,32 @@
-from collections import Sequence
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import islice
+import re
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+try:
+    from itertools import izip as zip
+except ImportError:
+    pass
 
 import pygments
-from pygments.token import Token, string_to_tokentype
-from literate import utils
+from pygments.token import STANDARD_TYPES, Token, string_to_tokentype
+from literate import stats, utils
 
-from renderer import Renderer
+from literate.renderer.renderer import Renderer
+
+#: Token types of whitespace; newer versions of pygments lex whitespace as
+#: Text.Whitespace rather than plain Text
+_space_types = frozenset([Token.Text, Token.Text.Whitespace])
 
 
 class Sub(object):
+    __slots__ = ('id', 'args')
+
     def __init__(self, id, *args):
         self.id = id
         self.args = args
@@ -22,6 +41,8 @@ class Sub(object):
 
 
 class Tok(object):
+    __slots__ = ('type', 'value', 'row', 'col', 'aligned')
+
     def __init__(self, type, value, row, col, aligned=False):
         self.type = type
         self.value = value
@@ -34,68 +55,224 @@ class Tok(object):
             repr(self.type), repr(self.value), repr(self.row), repr(self.col), repr(self.aligned))
 
     def is_whitespace(self):
-        return self.type is Token.Text and self.value.isspace()
+        return self.type in _space_types and self.value.isspace()
 
     def is_leading(self):
         return self.col == 0
 
 
+class SubstTemplate(object):
+    """
+    A subst entry from a format, compiled into str.format strings so that
+    emitting a substitution is a single formatting call. ^1, ^2, ... refer to
+    the substitution arguments; markers without a matching argument are left
+    untouched.
+    """
+    placeholder = re.compile(r'\^([1-9])')
+
+    def __init__(self, template):
+        self.template = template
+        self._formats = {}
+
+    def _compile(self, nargs):
+        parts = self.placeholder.split(self.template)
+        out = []
+        for i, part in enumerate(parts):
+            if i % 2 == 0:
+                out.append(part.replace('{', '{{').replace('}', '}}'))
+            elif int(part) <= nargs:
+                out.append('{%d}' % (int(part) - 1))
+            else:
+                out.append('^' + part)
+        return ''.join(out)
+
+    def __call__(self, *args):
+        fmt = self._formats.get(len(args))
+        if fmt is None:
+            fmt = self._formats[len(args)] = self._compile(len(args))
+        return fmt.format(*args)
+
+    def __repr__(self):
+        return "<SubstTemplate({})>".format(repr(self.template))
+
+
 class TokStream(Sequence):
-    def __init__(self, iter):
-        self.stream = list(iter)
+    """
+    A sequence of tokens with their positions. The tokens are stored as
+    parallel arrays of rows, columns and aligned flags, with token types and
+    values interned, and Tok objects are only built when they are read.
+    """
+
+    def __init__(self, iter=()):
+        self._types = []
+        self._type_ids = {}
+        self._values = []
+        self._value_ids = {}
+        self._space = []  # whether each interned value is all whitespace
+        self._type = array('i')
+        self._value = array('i')
+        self._row = array('i')
+        self._col = array('i')
+        self._aligned = array('b')
+        self._rows = None
+        self._aligned_cols = None
+        self._cells = None
+        self._columns = None
+        self.extend((tok.type, tok.value, tok.row, tok.col, tok.aligned) for tok in iter)
+
+    def append(self, type, value, row, col, aligned=False):
+        """Add a token to the end of the stream."""
+        self.extend([(type, value, row, col, aligned)])
+
+    def extend(self, tokens):
+        """Add (type, value, row, col, aligned) tuples to the end of the stream."""
+        types, type_ids, values, value_ids, space = (
+            self._types, self._type_ids, self._values, self._value_ids, self._space)
+        append_type, append_value, append_row, append_col, append_aligned = (
+            self._type.append, self._value.append, self._row.append, self._col.append, self._aligned.append)
+        for type, value, row, col, aligned in tokens:
+            t = type_ids.get(type)
+            if t is None:
+                t = type_ids[type] = len(types)
+                types.append(type)
+            v = value_ids.get(value)
+            if v is None:
+                v = value_ids[value] = len(values)
+                values.append(value)
+                space.append(value.isspace())
+            append_type(t)
+            append_value(v)
+            append_row(row)
+            append_col(col)
+            append_aligned(aligned)
+        self._rows = self._aligned_cols = self._cells = self._columns = None
+
+    def _tok(self, i):
+        return Tok(self._types[self._type[i]], self._values[self._value[i]],
+                   self._row[i], self._col[i], bool(self._aligned[i]))
+
+    def _is_whitespace(self, i):
+        return self._types[self._type[i]] in _space_types and self._space[self._value[i]]
 
     def _whitespace_prefix_length(self, row):
-        if not row or not row[0].is_whitespace():
+        if not row or not self._is_whitespace(row[0]):
             return 0
-        return len(row[0].value)
+        return len(self._values[self._value[row[0]]])
 
     def __len__(self):
-        return len(self.stream)
+        return len(self._type)
 
     def __getitem__(self, index):
-        return self.stream[index]
+        if isinstance(index, slice):
+            return [self._tok(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("token index out of range")
+        return self._tok(index)
+
+    def __iter__(self):
+        types, values = self._types, self._values
+        for t, v, row, col, aligned in zip(self._type, self._value, self._row, self._col, self._aligned):
+            yield Tok(types[t], values[v], row, col, bool(aligned))
+
+    @property
+    def stream(self):
+        """A list of every token in the stream."""
+        return list(self)
+
+    def _row_indices(self, row):
+        """The indices of the tokens in a row."""
+        if self._rows is None:
+            rows = self._row
+            if all(a <= b for a, b in zip(rows, islice(rows, 1, None))):
+                # Rows are in order, as the lexer produces them, so they can
+                # be searched for directly
+                self._rows = False
+            else:
+                self._rows = defaultdict(list)
+                for i, r in enumerate(rows):
+                    self._rows[r].append(i)
+        if self._rows is False:
+            return range(bisect_left(self._row, row), bisect_right(self._row, row))
+        return self._rows.get(row, ())
 
     @property
     def aligned_cols(self):
-        """The set of column indices at which text is aligned."""
-        return {t.col for t in self.stream if t.aligned}
+        """The set of column indices at which text is aligned. Do not modify it."""
+        if self._aligned_cols is None:
+            self._analyze_columns()
+        return self._aligned_cols
+
+    @property
+    def columns(self):
+        """
+        A dictionary from each aligned column index to the contents of that
+        column, as returned by get_column_contents. Do not modify it.
+        """
+        if self._columns is None:
+            if self._cells is None:
+                self._analyze_columns()
+            self._columns = {}
+            for col, cells in self._cells.items():
+                stripped = ([self._tok(i) for i in cell if not self._is_whitespace(i)] for cell in cells)
+                self._columns[col] = [cell for cell in stripped if cell]
+        return self._columns
+
+    def _analyze_columns(self):
+        """
+        Group the tokens into column cells in a single sweep. A cell starts at an
+        aligned token and runs until an aligned token in another column or the
+        end of the row. Cells hold token indices.
+        """
+        aligned_cols = set()
+        cells = defaultdict(list)
+        current = None
+        col = row = None
+        for i, (tok_aligned, tok_row, tok_col) in enumerate(zip(self._aligned, self._row, self._col)):
+            if tok_aligned:
+                aligned_cols.add(tok_col)
+                if current is not None and tok_col == col:
+                    row = tok_row
+                else:
+                    if current:
+                        cells[col].append(current)
+                    current = []
+                    col, row = tok_col, tok_row
+            elif current is not None and tok_row != row:
+                if current:
+                    cells[col].append(current)
+                current = None
+            if current is not None:
+                current.append(i)
+        if current:
+            cells[col].append(current)
+        self._aligned_cols = aligned_cols
+        self._cells = cells
 
     @property
     def num_rows(self):
         """The number of rows in this token stream."""
-        return max(t.row for t in self.stream)
+        return max(self._row)
 
     @property
     def gobble_size(self):
         """The amount of whitespace by which every line is indented."""
-        return min([self._whitespace_prefix_length(self.get_row_contents(i, True))
-                    for i in xrange(self.num_rows)] or [0])
+        return min([self._whitespace_prefix_length(self._row_indices(i))
+                    for i in range(self.num_rows)] or [0])
 
     def get_row_contents(self, row, include_whitespace=False):
         """Return a list containing every token in a given row."""
-        return [tok for tok in self if tok.row == row and (include_whitespace or not tok.is_whitespace())]
+        return [self._tok(i) for i in self._row_indices(row)
+                if include_whitespace or not self._is_whitespace(i)]
 
     def get_column_contents(self, col, include_whitespace=False):
         """Return the contents of the given column, as a list of list of tokens."""
-        out = []
-        capture = False
-        capture_row = 0
-        current = []
-        for tok in self:
-            if tok.aligned and tok.col == col:
-                capture_row = tok.row
-                capture = True
-            elif (tok.aligned and tok.col != col) or (capture and tok.row != capture_row):
-                capture = False
-                if current:
-                    out.append(current)
-                current = []
-
-            if capture and (include_whitespace or not tok.is_whitespace()):
-                current.append(tok)
-        if current:
-            out.append(current)
-        return out
+        if not include_whitespace:
+            return [list(cell) for cell in self.columns.get(col, [])]
+        if self._cells is None:
+            self._analyze_columns()
+        return [[self._tok(i) for i in cell] for cell in self._cells.get(col, [])]
 
 
 class PolyTableRenderer(Renderer):
@@ -103,8 +280,33 @@ class PolyTableRenderer(Renderer):
     Base renderer for polytable-based rendering. Must override create_lexer.
     """
 
-    def __init__(self, config=None, format=None):
-        super(PolyTableRenderer, self).__init__(config, format)
+    #: Maximum number of (token type, value) pairs whose rendering is memoized
+    token_memo_size = 8192
+
+    def __init__(self, config=None, format=None, cache=None):
+        super(PolyTableRenderer, self).__init__(config, format, cache)
+        self._lexer = None
+        self.templates = dict((id, SubstTemplate(template))
+                              for id, template in self.format.subst.items())
+
+        # Token dispatch tables: literal replacements by token value (with the
+        # token types they are restricted to), subst templates by token type,
+        # and a memo of fully rendered tokens
+        self.token_formats = dict(
+            (value, (opt['to'], tuple(string_to_tokentype(tt) for tt in opt['if'])))
+            for value, opt in self.format.format.items())
+        self._type_templates = {}
+        for type in STANDARD_TYPES:
+            self._type_template(type)
+        self._token_memo = utils.BoundedCache(self.token_memo_size)
+        self._debug_subs = {}
+
+    @property
+    def lexer(self):
+        """The lexer for this renderer, created on first use and then reused."""
+        if self._lexer is None:
+            self._lexer = self.create_lexer()
+        return self._lexer
 
     def create_lexer(self):
         """Return a Pygment lexer to use for this renderer."""
@@ -125,8 +327,9 @@ class PolyTableRenderer(Renderer):
                     has_op = True
             return has_op
 
+        columns = token_stream.columns
         for c in token_stream.aligned_cols:
-            if should_center_column(token_stream.get_column_contents(c)):
+            if should_center_column(columns.get(c, [])):
                 spec[c] = Sub('CenterColumn')
             else:
                 spec[c] = Sub('LeftColumn')
@@ -138,13 +341,11 @@ class PolyTableRenderer(Renderer):
         syntax tokens and position information.
         """
         def _generator():
-            lexer = self.create_lexer()
-            raw = pygments.lex(code_region.text, lexer)
+            raw = pygments.lex(code_region.text, self.lexer)
 
             row, col = 0, 0
             begin_column = False
             for type, value in raw:
-                tok = Tok(type, value, row, col, begin_column)
                 if '\n' in value:
                     # Pygments doesn't necessarily split spaces and newlines into
                     # separate tokens, so we do it ourselves, ensuring there is always
@@ -152,26 +353,29 @@ class PolyTableRenderer(Renderer):
                     spaces = value.split('\n')
                     begin_column = False
                     if spaces[0]:
-                        yield Tok(type, spaces[0], row, col)
+                        yield type, spaces[0], row, col, False
                         col += len(spaces[0])
                     for sp in spaces[1:]:
-                        yield Tok(Token.Text, '\n', row, col)
+                        yield Token.Text, '\n', row, col, False
                         row += 1
                         col = 0
                         if not sp:
                             continue
-                        yield Tok(Token.Text, sp, row, col)
+                        yield Token.Text, sp, row, col, False
                         begin_column = True
                         col += len(sp)
                     continue
-                if tok.is_whitespace():
+                yield type, value, row, col, begin_column
+                if type in _space_types and value.isspace():
                     if len(value) > 1:
                         begin_column = True
                 else:
                     begin_column = False
                 col += len(value)
-                yield tok
-        return TokStream(_generator())
+
+        stream = TokStream()
+        stream.extend(_generator())
+        return stream
 
     def transform(self, token_stream, gobble, begin, end):
         """
@@ -187,7 +391,7 @@ class PolyTableRenderer(Renderer):
 
         out.append(Sub(begin))
         out.append(Sub('Column', '0', Sub('LeftColumn')))
-        for col in token_stream.aligned_cols:
+        for col in sorted(token_stream.aligned_cols):
             out.append(Sub('Column', col, col_specs[col]))
         out.append(Sub('Column', 'E', Sub('LeftColumn')))
 
@@ -210,12 +414,20 @@ class PolyTableRenderer(Renderer):
                 continue
             if not tok.is_whitespace():
                 buffer.append(tok)
-                buffer.append(Sub('Debug', tok.type))
+                buffer.append(self._debug_sub(tok.type))
         if buffer:
             out.append(Sub('FromTo', aligncol, 'E', buffer))
         out.append(Sub(end))
         return out
 
+    def _debug_sub(self, type):
+        # Subs are never modified once built, so one Debug Sub per token type
+        # is shared by every token of that type
+        sub = self._debug_subs.get(type)
+        if sub is None:
+            sub = self._debug_subs[type] = Sub('Debug', type)
+        return sub
+
     def pre_substitute_hook(self, buffer):
         """
         Allow derived classes to modify the substitution token buffer before
@@ -232,45 +444,84 @@ class PolyTableRenderer(Renderer):
         def subarg(arg):
             if isinstance(arg, Sub):
                 return ' '.join(self.substitute(arg))
-            elif hasattr(arg, '__iter__'):
+            elif isinstance(arg, (list, tuple)):
                 return ' '.join([' '.join(self.substitute(s)) for s in arg])
-            return str(arg)
+            return utils.text_type(arg)
 
         if isinstance(sub, Sub):
-            if sub.id not in self.format.subst:
-                return "??{}??".format(sub.id)
-            args = [subarg(x) for x in sub.args]
-            strout = self.format.subst[sub.id]
-            for x in xrange(len(args)):
-                strout = strout.replace('^' + str(x+1), args[x])
-            return [strout]
+            template = self.templates.get(sub.id)
+            if template is None:
+                return ["??{}??".format(sub.id)]
+            return [template(*[subarg(x) for x in sub.args])]
         elif isinstance(sub, Tok):
-            if sub.is_whitespace():
-                return [' ']
-            value = utils.latex_escape(sub.value)
-            subbed = False
-            if sub.value in self.format.format:
-                opt = self.format.format[sub.value]
-                if not opt['if'] or any(sub.type in string_to_tokentype(tt) for tt in opt['if']):
-                    value = opt['to']
-                    subbed = True
-            tok_types = map(lambda x: str(x).replace('.', '')[5:], reversed(sub.type.split()))
-            found = [y for y in tok_types if y in self.format.subst]
-            if found and not subbed:
-                result = ' '.join(self.substitute(Sub(found[0], value)))
-                return [result]
-            return [value]
-        return [str(sub)]
+            return [self.substitute_token(sub.type, sub.value)]
+        return [utils.text_type(sub)]
+
+    def _type_template(self, type):
+        """Get the subst template for the most specific matching part of a token type."""
+        try:
+            return self._type_templates[type]
+        except KeyError:
+            pass
+        template = None
+        for t in reversed(type.split()):
+            template = self.templates.get(str(t).replace('.', '')[5:])
+            if template is not None:
+                break
+        self._type_templates[type] = template
+        return template
+
+    def substitute_token(self, type, value):
+        """Render a single token of the given type and value."""
+        key = (type, value)
+        try:
+            return self._token_memo[key]
+        except KeyError:
+            pass
+
+        if type in _space_types and value.isspace():
+            return self._token_memo.put(key, ' ')
+        entry = self.token_formats.get(value)
+        if entry is not None:
+            to, types = entry
+            if not types or any(type in t for t in types):
+                return self._token_memo.put(key, to)
+        result = utils.latex_escape(value)
+        template = self._type_template(type)
+        if template is not None:
+            result = template(result)
+        return self._token_memo.put(key, result)
 
     def render(self, code_region):
-        token_stream = self.get_token_stream(code_region)
+        if self.cache is None:
+            return self._render(code_region)
+        if stats.active is not None:
+            return stats.active.render_cached(self, code_region)
+        key = self.cache.key(self, code_region)
+        text = self.cache.get(key)
+        if text is None:
+            text = self._render(code_region)
+            self.cache.put(key, text)
+        return text
+
+    def region_options(self, code_region):
+        """The gobble size and the begin and end subst ids used to render a code region."""
         if 'gobble' not in code_region.options:
             gobble = None
         else:
             gobble = int(code_region.options['gobble'])
         begin_code = code_region.options.get('begin') or 'Code'
         end_code = code_region.options.get('end') or 'EndCode'
-        transformed = self.transform(token_stream, gobble, begin_code, end_code)
+        return gobble, begin_code, end_code
+
+    def substitute_all(self, transformed):
+        """Substitute a whole transformed token buffer and join the result."""
+        return utils.native_str(u' '.join(u''.join(self.substitute(t)) for t in transformed))
+
+    def _render(self, code_region):
+        if stats.active is not None:
+            return stats.active.render_region(self, code_region)
+        token_stream = self.get_token_stream(code_region)
+        transformed = self.transform(token_stream, *self.region_options(code_region))
         transformed = self.pre_substitute_hook(transformed)
-        substituted = ' '.join(''.join(self.substitute(t)) for t in transformed)
-        return str(substituted)
+        return self.substitute_all(transformed)
@@ -6,9 +6,10 @@ class Renderer(object):
     """
     The base renderer class for rendering code regions.
     """
-    def __init__(self, config=None, format=None):
+    def __init__(self, config=None, format=None, cache=None):
         self.config = literate.default_config + config
         self.format = literate.default_format + format
+        self.cache = cache
 
     def render(self, code_region):
         raise NotImplementedError()
@@ -27,8 +27,9 @@ class ScalaSpacer(Spacer):
 
 class ScalaRenderer(PolyTableRenderer):
     def create_lexer(self):
-        from literate.utils import TokenMergeFilter
-        l = ScalaLexer()
+        from literate.renderer.filters import TokenMergeFilter
+        from literate.renderer.lexer import combined
+        l = combined(ScalaLexer)()
         l.add_filter(TokenMergeFilter(merge_types=[Whitespace, String]))
         return l
 
@@ -168,7 +169,7 @@ class ScalaLexer(RegexLexer):
              u'\ua77d-\ua77e\ua780\ua782\ua784\ua786\ua78b\uff21-\uff3a]')
 
     idrest = u'%s(?:%s|[0-9])*(?:(?<=_)%s)?' % (letter, letter, op)
-    letter_letter_digit = u'%s(?:%s|\d)*' % (letter, letter)
+    letter_letter_digit = u'%s(?:%s|\\d)*' % (letter, letter)
 
     tokens = {
         'root': [
@@ -1,6 +1,11 @@
 import re
 from pygments.token import Token
 from literate.renderer.poly import Tok, Sub
+from literate.utils import BoundedCache
+
+
+# Subs are never modified once built, so every space shares one
+_space = Sub('Space')
 
 
 class Spacer(object):
@@ -9,30 +14,41 @@ class Spacer(object):
     spaces out the tokens within columns (FromTo substitution tokens).
     """
 
+    #: Maximum number of (previous value, next value) decisions memoized per spacer
+    memo_size = 8192
+
     @classmethod
     def space_info(cls):
         return {}
 
+    @classmethod
+    def matcher(cls):
+        """
+        Return a function deciding whether a space goes between two token
+        values. The rules from space_info are compiled once per class, with the
+        alternatives for each rule merged into one regex, and decisions are
+        memoized.
+        """
+        matcher = cls.__dict__.get('_matcher')
+        if matcher is None:
+            matcher = _compile_rules(cls.space_info(), cls.memo_size)
+            cls._matcher = matcher
+        return matcher
+
     def consume(self, token, state):
         """
         Consume one token in the given state and return a list of tokens to
         emit along with a new state.
         """
-        info = self.space_info()
-
         if not isinstance(token, Tok):
             return [token], state
         if not state:
             return [token], token
 
-        for before, afters in info:
-            if re.match(before, state.value):
-                for after in afters:
-                    if re.match(after, token.value):
-                        return [Sub('Space'), token], token
+        if self.matcher()(state.value, token.value):
+            return [_space, token], token
         return [token], token
 
-
     @classmethod
     def respace(cls, buffer):
         """
@@ -53,4 +69,22 @@ class Spacer(object):
                 new_buffer.append(Sub('FromTo', col_from, col_to, new_content))
             else:
                 new_buffer.append(elem)
-        return new_buffer
\ No newline at end of file
+        return new_buffer
+
+
+def _compile_rules(info, memo_size):
+    rules = [(re.compile(before).match,
+              re.compile('|'.join('(?:{})'.format(after) for after in afters)).match)
+             for before, afters in info if afters]
+    memo = BoundedCache(memo_size)
+
+    def should_space(before, after):
+        key = (before, after)
+        try:
+            return memo[key]
+        except KeyError:
+            pass
+        result = any(match_before(before) is not None and match_after(after) is not None
+                     for match_before, match_after in rules)
+        return memo.put(key, result)
+    return should_space
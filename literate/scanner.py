@@ -0,0 +1,179 @@
+from collections import namedtuple
+
+
+TEXT = 'text'
+CODE = 'code'
+
+
+class Segment(namedtuple('Segment', 'kind start end offset line options source base')):
+    """
+    An immutable piece of a scanned document. Text segments hold prose that is
+    passed through untouched; code segments hold the body of a code block with
+    its delimiters and options line removed.
+
+    start and end are offsets into the original document, while offset is the
+    position of the segment in the document with all delimiters stripped.
+    line is the line of the document on which the segment starts.
+    A segment does not hold a copy of its text: source is the buffer it was
+    scanned from, starting at position base of the document, and the text is
+    sliced out of it when it is read.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'Segment(kind={!r}, start={!r}, end={!r}, offset={!r}, line={!r}, options={!r})'.format(
+            self.kind, self.start, self.end, self.offset, self.line, self.options)
+
+    def __reduce__(self):
+        # Pickle only the text of the segment, not the whole buffer
+        return Segment, (self.kind, self.start, self.end, self.offset, self.line, self.options,
+                         self.text, self.start)
+
+    @property
+    def is_code(self):
+        return self.kind == CODE
+
+    @property
+    def length(self):
+        return self.end - self.start
+
+    @property
+    def text(self):
+        return self.source[self.start - self.base:self.end - self.base]
+
+
+def scan(text, code_start, code_end):
+    """
+    Split text into a tuple of text and code segments in a single pass.
+    Raises ValueError if a code block is never closed.
+    """
+    code_start, code_end = _delimiters(text, code_start, code_end)
+    segments = []
+    pos = 0
+    offset = 0
+    line = 1
+    while True:
+        start = text.find(code_start, pos)
+        if start == -1:
+            break
+        end = text.find(code_end, start + 1)
+        if end == -1:
+            raise ValueError("Mismatched code blocks found")
+
+        if start > pos:
+            segments.append(Segment(TEXT, pos, start, offset, line, None, text, 0))
+            offset += start - pos
+
+        opts, body_start = _parse_options(text, start + len(code_start), end)
+        line += text.count('\n', pos, body_start)
+        segments.append(Segment(CODE, body_start, end, offset, line, opts, text, 0))
+        offset += end - body_start
+        pos = end + len(code_end)
+        line += text.count('\n', body_start, pos)
+
+    if pos < len(text):
+        segments.append(Segment(TEXT, pos, len(text), offset, line, None, text, 0))
+    return tuple(segments)
+
+
+def scan_stream(infile, code_start, code_end, chunk_size=1 << 16):
+    """
+    Split the text read from infile into segments like scan(), but read it
+    incrementally and yield each segment as soon as it is complete. Prose is
+    yielded in pieces as it is read, so at most one code block and one chunk
+    are held in memory at a time. Yields (line, segment) pairs, where line is
+    the line number at which the segment starts.
+    Raises ValueError if a code block is never closed.
+    """
+    buf = ''
+    base = 0  # position of buf in the document
+    offset = 0
+    line = 1
+    eof = False
+    search_from = 0
+    while True:
+        start = buf.find(code_start)
+        if start == -1:
+            # Hold back anything that could be the beginning of a delimiter
+            cut = len(buf) if eof else max(len(buf) - len(code_start) + 1, 0)
+        else:
+            end = buf.find(code_end, max(start + 1, search_from))
+            if end == -1 and eof:
+                raise ValueError("Mismatched code blocks found")
+            cut = start
+
+        if cut:
+            yield line, Segment(TEXT, base, base + cut, offset, line, None, buf, base)
+            offset += cut
+            line += buf.count('\n', 0, cut)
+            base += cut
+            buf = buf[cut:]
+            search_from = max(search_from - cut, 0)
+            continue
+
+        if start == 0 and end != -1:
+            opts, body_start = _parse_options(buf, len(code_start), end)
+            body_line = line + buf.count('\n', 0, body_start)
+            yield body_line, Segment(CODE, base + body_start, base + end, offset, body_line, opts, buf, base)
+            offset += end - body_start
+            consumed = end + len(code_end)
+            line += buf.count('\n', 0, consumed)
+            base += consumed
+            buf = buf[consumed:]
+            search_from = 0
+            continue
+
+        if eof:
+            return
+        if start == 0:
+            search_from = max(len(buf) - len(code_end) + 1, 0)
+        chunk = infile.read(chunk_size)
+        if not chunk:
+            eof = True
+        elif not buf and base == 0:
+            code_start, code_end = _delimiters(chunk, code_start, code_end)
+        buf += chunk
+
+
+def _delimiters(text, code_start, code_end):
+    # Delimiters loaded from JSON are unicode; searching a byte string for
+    # them would decode the whole document on every search
+    if isinstance(text, bytes) and not isinstance(code_start, bytes):
+        code_start = code_start.encode('utf-8')
+    if isinstance(text, bytes) and not isinstance(code_end, bytes):
+        code_end = code_end.encode('utf-8')
+    return code_start, code_end
+
+
+def parse_options(text):
+    """
+    Attempt to parse a comma-delimited key-value pair surrounded by braces,
+    and return the resulting dictionary. Failures result in {}.
+    """
+    opts, body_start = _parse_options(text, 0, len(text))
+    return opts, text[body_start:]
+
+
+def _parse_options(text, start, end):
+    """
+    Parse the options of the code block text[start:end] like parse_options,
+    but return the position at which the body starts instead of a copy of it.
+    """
+    nl = text.find('\n', start, end)
+    brace = text.find('{', start, end)
+    if brace == -1 or brace > nl:
+        return {}, start if nl == -1 else nl + 1
+
+    close = text.find('}', brace, end)
+    result = {}
+    if close == -1:
+        # The body is cut at the length of the first line, counted from the brace
+        return result, min(brace + nl - start + 1, end)
+    # We actually want to skip the entire line that the code block is on
+    nl = text.find('\n', close, end)
+    for opt in text[brace + 1:close].split(','):
+        if '=' not in opt:
+            continue
+        k, v = opt.split('=')
+        result[k] = v
+    return result, brace if nl == -1 else nl + 1
@@ -0,0 +1,235 @@
+import errno
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import threading
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+import literate
+from literate import utils
+from literate.config import Config
+from literate.corpus import Corpus
+from literate.registry import default_registry
+
+
+class ServerUnavailable(Exception):
+    """Raised by the client when no compatible render server is listening."""
+    pass
+
+
+def default_socket_path():
+    """The Unix socket path used by the render server when none is given."""
+    if os.environ.get('LIT_SOCKET'):
+        return os.environ['LIT_SOCKET']
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        return os.path.join(os.environ['XDG_RUNTIME_DIR'], 'literate-{}.sock'.format(os.getuid()))
+    # /tmp is shared with other users, so the socket goes in a directory
+    # that only this user can enter
+    return os.path.join(_shared_tmp_directory(), 'render.sock')
+
+
+def _shared_tmp_directory():
+    return os.path.join('/tmp', 'literate-{}'.format(os.getuid()))
+
+
+def _is_private_directory(path):
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def _check_socket(path):
+    """
+    Raise ServerUnavailable unless the socket at path belongs to this user,
+    so that documents are never sent to a server run by someone else.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if directory == _shared_tmp_directory() and not _is_private_directory(directory):
+        raise ServerUnavailable("{} is not a private directory".format(directory))
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        raise ServerUnavailable(str(e))
+    if st.st_uid != os.getuid():
+        raise ServerUnavailable("{} belongs to another user".format(path))
+
+
+def _send(sock, message):
+    data = json.dumps(message, default=dict).encode('utf-8')
+    sock.sendall(struct.pack('!I', len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 16))
+        if not chunk:
+            raise EOFError("Connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv(sock):
+    size, = struct.unpack('!I', _recv_exactly(sock, 4))
+    return json.loads(_recv_exactly(sock, size).decode('utf-8'))
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            request = _recv(self.request)
+        except (EOFError, ValueError, struct.error):
+            return
+        _send(self.request, self.server.handle_request_message(request))
+
+
+class RenderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    A daemon that renders documents sent over a Unix socket. It keeps the
+    renderers, compiled formats, lexers and render cache of the process warm
+    between requests, and reloads the package config and format files when
+    they change on disk.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path=None, cache=None, registry=None):
+        self.path = path or default_socket_path()
+        self.cache = cache
+        self.registry = registry or default_registry
+        self._lock = threading.Lock()
+        self._defaults_mtime = self._mtimes()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if directory == _shared_tmp_directory():
+            if not os.path.exists(directory):
+                os.mkdir(directory, 0o700)
+            if not _is_private_directory(directory):
+                raise RuntimeError("{} is not a private directory".format(directory))
+        _remove_stale_socket(self.path)
+        socketserver.UnixStreamServer.__init__(self, self.path, _RequestHandler)
+        os.chmod(self.path, 0o600)
+
+    @staticmethod
+    def _mtimes():
+        mtimes = []
+        for filename in ('literate.conf.json', 'literate.fmt.json'):
+            try:
+                mtimes.append(os.stat(utils.resource_path(filename)).st_mtime)
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+    def refresh(self):
+        """Reload any config or format files that changed since the last request."""
+        with self._lock:
+            mtimes = self._mtimes()
+            if mtimes != self._defaults_mtime:
+                literate.default_config = Config(utils.load_json('literate.conf.json', True))
+                literate.default_format = Config(utils.load_json('literate.fmt.json', True))
+                self.registry.invalidate()
+                self._defaults_mtime = mtimes
+            else:
+                self.registry.refresh()
+
+    def warm(self):
+        """Build the renderer and lexer of every configured language ahead of time."""
+        for lang in literate.default_config.renderers:
+            self.registry.get(lang, literate.default_config, None, self.cache).lexer
+
+    def handle_request_message(self, request):
+        if request.get('version') != literate.__version__:
+            return {'error': 'version mismatch', 'version': literate.__version__}
+        self.refresh()
+        try:
+            formats = dict((lang, Config(fmt)) for lang, fmt in (request.get('formats') or {}).items())
+            corpus = Corpus(request['text'], Config(request.get('config')), formats,
+                            self.cache, self.registry)
+            return {'output': corpus.render()}
+        except Exception as e:
+            return {'error': '{}: {}'.format(type(e).__name__, e)}
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(path):
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise RuntimeError("{} exists and is not a socket".format(path))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        os.unlink(path)
+    else:
+        raise RuntimeError("A render server is already listening on {}".format(path))
+    finally:
+        sock.close()
+
+
+def serve(path=None, cache=None):
+    """Run a render server on the given socket path until interrupted."""
+    server = RenderServer(path, cache)
+    server.warm()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def render_remote(text, config=None, formats=None, path=None, timeout=None):
+    """
+    Render a document on a running render server and return the output.
+    Raises ServerUnavailable if no compatible server of this user is listening,
+    or if it does not reply within timeout seconds or goes away before it
+    does, and RuntimeError if the server failed to render the document.
+    """
+    path = path or default_socket_path()
+    _check_socket(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+        _send(sock, {
+            'version': literate.__version__,
+            'text': text,
+            'config': config,
+            'formats': formats or {}
+        })
+        response = _recv(sock)
+    except socket.timeout:
+        raise ServerUnavailable("No reply from {} within {} seconds".format(path, timeout))
+    except EOFError:
+        raise ServerUnavailable("{} closed the connection".format(path))
+    except socket.error as e:
+        if e.errno in (errno.ENOENT, errno.ECONNREFUSED, errno.ECONNRESET, errno.EPIPE):
+            raise ServerUnavailable(str(e))
+        raise
+    finally:
+        sock.close()
+    if 'version' in response and response['version'] != literate.__version__:
+        raise ServerUnavailable(response['error'])
+    if 'error' in response:
+        raise RuntimeError(response['error'])
+    return response['output']
@@ -0,0 +1,120 @@
+"""
+Optional instrumentation of the render pipeline. While no Stats object is
+active the pipeline only checks the module-level `active` attribute once per
+document and once per code region; nothing is timed or recorded.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+import json
+import time
+
+#: The pipeline stages that are timed, in order
+STAGES = ('scan', 'cache', 'lex', 'columns', 'transform', 'respace', 'substitute')
+
+#: The Stats object currently collecting, or None
+active = None
+
+
+RegionStats = namedtuple('RegionStats', 'line lang tokens aligned_cols time')
+
+
+def enable():
+    """Start collecting into a new Stats object and return it."""
+    global active
+    active = Stats()
+    return active
+
+
+def disable():
+    """Stop collecting and return the Stats object that was active, if any."""
+    global active
+    stats, active = active, None
+    return stats
+
+
+class Stats(object):
+    """Time per pipeline stage and per code region for the documents rendered while active."""
+
+    def __init__(self):
+        self.times = dict.fromkeys(STAGES, 0.0)
+        self.regions = []
+        self.cached = 0
+
+    @contextmanager
+    def stage(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.times[name] += time.time() - start
+
+    def render_cached(self, renderer, code_region):
+        """Render code_region through the cache of renderer, timing the cache lookups as their own stage."""
+        cache = renderer.cache
+        t0 = time.time()
+        key = cache.key(renderer, code_region)
+        text = cache.get(key)
+        self.times['cache'] += time.time() - t0
+        if text is not None:
+            self.cached += 1
+            return text
+        text = self.render_region(renderer, code_region)
+        t1 = time.time()
+        cache.put(key, text)
+        self.times['cache'] += time.time() - t1
+        return text
+
+    def render_region(self, renderer, code_region):
+        """Render code_region with a PolyTableRenderer, timing every stage."""
+        times = self.times
+        t0 = time.time()
+        token_stream = renderer.get_token_stream(code_region)
+        t1 = time.time()
+        aligned_cols = token_stream.aligned_cols
+        t2 = time.time()
+        transformed = renderer.transform(token_stream, *renderer.region_options(code_region))
+        t3 = time.time()
+        transformed = renderer.pre_substitute_hook(transformed)
+        t4 = time.time()
+        text = renderer.substitute_all(transformed)
+        t5 = time.time()
+
+        times['lex'] += t1 - t0
+        times['columns'] += t2 - t1
+        times['transform'] += t3 - t2
+        times['respace'] += t4 - t3
+        times['substitute'] += t5 - t4
+        self.regions.append(RegionStats(code_region.line, code_region.options.get('lang'),
+                                        len(token_stream), len(aligned_cols), t5 - t0))
+        return text
+
+    def summary(self, slowest=5):
+        """A JSON-friendly summary of the collected stats."""
+        regions = sorted(self.regions, key=lambda r: r.time, reverse=True)[:slowest]
+        return {
+            'stages': dict(self.times),
+            'regions': len(self.regions),
+            'cached': self.cached,
+            'tokens': sum(r.tokens for r in self.regions),
+            'aligned_cols': sum(r.aligned_cols for r in self.regions),
+            'slowest': [r._asdict() for r in regions]
+        }
+
+    def format(self, slowest=5, as_json=False):
+        """Format the summary as a human readable report, or as JSON."""
+        summary = self.summary(slowest)
+        if as_json:
+            return json.dumps(summary, indent=2, sort_keys=True)
+        total = sum(self.times.values())
+        lines = ['{} regions rendered, {} from the cache, {} tokens, {} aligned columns'.format(
+            summary['regions'], summary['cached'], summary['tokens'], summary['aligned_cols'])]
+        for name in STAGES:
+            t = self.times[name]
+            lines.append('  {:<12} {:>9.1f} ms {:>5.1f}%'.format(name, t * 1000, 100 * t / total if total else 0))
+        if summary['slowest']:
+            lines.append('slowest regions:')
+            for r in summary['slowest']:
+                lines.append('  line {:<6} {:<10} {:>9.1f} ms {:>6} tokens {:>3} aligned columns'.format(
+                    r['line'] if r['line'] is not None else '?', r['lang'], r['time'] * 1000,
+                    r['tokens'], r['aligned_cols']))
+        return '\n'.join(lines)
@@ -1,20 +1,53 @@
 from importlib import import_module
+import hashlib
 import json
 import os
-from pygments.filter import Filter
+import re
+import sys
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+class BoundedCache(dict):
+    """
+    A dictionary for memoization that is emptied whenever it grows past
+    maxsize entries, keeping memory bounded without the bookkeeping of a
+    true LRU cache.
+    """
+    def __init__(self, maxsize):
+        super(BoundedCache, self).__init__()
+        self.maxsize = maxsize
+
+    def put(self, key, value):
+        if len(self) >= self.maxsize:
+            self.clear()
+        self[key] = value
+        return value
+
+
+_latex_escapes = {
+    '\\': r'\textbackslash{}', r'#': r'\#', r'$': r'\$', r'%': r'\%', '^': r'\^{}',
+    r'&': r'\&', r'_': r'\_', r'{': r'\{', r'}': r'\}', '~': r'\~{}', r'"': r'\char34 ',
+    r"'": r'\char39 '
+}
+_latex_special = re.compile('[{}]'.format(re.escape(''.join(_latex_escapes))))
+_latex_escape_cache = BoundedCache(4096)
 
 
 def latex_escape(text):
-    """Replace special LaTeX characters with their escaped counterparts."""
-    escape_map = {
-        r'#': r'\#', r'$': r'\$', r'%': r'\%', '^': r'\^{}', r'&': r'\&',
-        r'_': r'\_', r'{': r'\{', r'}': r'\}', '~': r'\~{}', r'"': r'\char34 ',
-        r"'": r'\char39 '
-    }
-    text = text.replace('\\', r'\textbackslash')
-    for k, v in escape_map.iteritems():
-        text = text.replace(k, v)
-    return text
+    """
+    Replace special LaTeX characters with their escaped counterparts. The text
+    is escaped in a single pass, so replacements are never escaped again.
+    """
+    try:
+        return _latex_escape_cache[text]
+    except KeyError:
+        pass
+    escaped = _latex_special.sub(lambda m: _latex_escapes[m.group()], text)
+    return _latex_escape_cache.put(text, escaped)
 
 
 def get_class(name):
@@ -28,37 +61,59 @@ def get_class(name):
     return getattr(mod, clsname)
 
 
+def resource_path(filename):
+    """Get the path of a file relative to the literate package root."""
+    return os.path.join(os.path.dirname(__file__), os.path.join('..', filename))
+
+
 def load_json(filename, module=False):
     """
     Load a JSON file from a filename. If module is True, the file
     will be imported relative to the literate package root.
     """
     if module:
-        filename = os.path.join(os.path.dirname(__file__), os.path.join('..', filename))
-    with open(filename) as f:
+        filename = resource_path(filename)
+    with open_text(filename) as f:
         return json.load(f)
 
 
-class TokenMergeFilter(Filter):
-    """Merges consecutive tokens with the same token type in the output
-    stream of a lexer.
+def open_text(file, mode='r'):
+    """
+    Open a file (a path or a descriptor) for reading or writing native str.
+    On Python 3 the file is decoded and encoded as UTF-8, whatever the locale;
+    on Python 2 it holds bytes, which are passed through unchanged.
+    """
+    if str is bytes:
+        return os.fdopen(file, mode) if isinstance(file, int) else open(file, mode)
+    return open(file, mode, encoding='utf-8')
+
 
-    .. versionadded:: 1.2
+def std_text(name):
+    """
+    Return sys.stdin or sys.stdout, switched to UTF-8 on Python 3 where the
+    stream allows it.
     """
-    def __init__(self, **options):
-        Filter.__init__(self, **options)
-
-    def filter(self, lexer, stream):
-        current_type = None
-        current_value = None
-        merge_types = self.options.get('merge_types') or []
-        for ttype, value in stream:
-            if ttype is current_type and (not merge_types or ttype in merge_types):
-                current_value += value
-            else:
-                if current_type is not None:
-                    yield current_type, current_value
-                current_type = ttype
-                current_value = value
-        if current_type is not None:
-            yield current_type, current_value
\ No newline at end of file
+    stream = getattr(sys, name)
+    if hasattr(stream, 'reconfigure'):
+        stream.reconfigure(encoding='utf-8')
+    return stream
+
+
+def native_str(text):
+    """Convert text to the native str type; unicode is encoded as UTF-8 on Python 2."""
+    if isinstance(text, str):
+        return text
+    return text.encode('utf-8')
+
+
+def to_text(text):
+    """Convert native str to unicode text; bytes are decoded as UTF-8 on Python 2."""
+    if isinstance(text, bytes):
+        return text.decode('utf-8')
+    return text
+
+
+def digest(*values):
+    """Get a stable hash of JSON-like values, including Configs."""
+    payload = json.dumps(values, sort_keys=True, default=dict)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
@@ -0,0 +1,119 @@
+import os
+import tempfile
+import time
+
+from literate import Config, utils
+from literate.corpus import Corpus
+
+
+class Watcher(object):
+    """
+    Keeps an output file up to date with an input file by polling it, along
+    with the config and format files it is rendered with. Only the code
+    regions whose text or effective format changed are rendered again, and
+    the output file is replaced atomically, and only when its contents
+    actually change.
+    """
+
+    def __init__(self, inpath, outpath, config_path=None, format_paths=(), cache=None, jobs=None):
+        self.inpath = inpath
+        self.outpath = outpath
+        self.config_path = config_path
+        self.format_paths = list(format_paths)
+        self.cache = cache
+        self.jobs = jobs
+        self.corpus = None
+        self._stamps = None
+        self._output = None
+
+    def paths(self):
+        """The paths of every watched file."""
+        return [self.inpath] + ([self.config_path] if self.config_path else []) + \
+            [path for lang, path in self.format_paths]
+
+    def _stat(self):
+        stamps = []
+        for path in self.paths():
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_mtime, st.st_size, st.st_ino))
+            except OSError:
+                stamps.append(None)
+        return stamps
+
+    def _load(self):
+        config = Config.load(self.config_path) if self.config_path else Config()
+        formats = {}
+        for lang, path in self.format_paths:
+            formats[lang] = formats.get(lang, Config()) + Config.load(path)
+        with utils.open_text(self.inpath) as infile:
+            text = infile.read()
+        return text, config, formats
+
+    def poll(self):
+        """
+        Bring the output up to date if any watched file changed since the last
+        poll. Returns the UpdateStats of the update, or None if nothing changed.
+        Errors while loading or rendering are raised and leave the output
+        alone; the files are rendered again once they change.
+        """
+        stamps = self._stat()
+        if stamps == self._stamps:
+            return None
+        self._stamps = stamps
+        text, config, formats = self._load()
+        if self.corpus is None:
+            self.corpus = Corpus('', config, formats, self.cache)
+        stats = self.corpus.update(text, config, formats, self.jobs)
+        self.write(self.corpus.render())
+        return stats
+
+    def write(self, output):
+        """
+        Atomically replace the output file with output, unless it already
+        holds exactly that. Returns True if the file was written.
+        """
+        if self._output is None:
+            try:
+                with utils.open_text(self.outpath) as outfile:
+                    self._output = outfile.read()
+            except IOError:
+                pass
+        if output == self._output:
+            return False
+        dirname, basename = os.path.split(os.path.abspath(self.outpath))
+        fd, tmppath = tempfile.mkstemp(prefix='.' + basename + '.', dir=dirname)
+        try:
+            with utils.open_text(fd, 'w') as tmpfile:
+                tmpfile.write(output)
+            try:
+                os.chmod(tmppath, os.stat(self.outpath).st_mode & 0o7777)
+            except OSError:
+                os.chmod(tmppath, 0o666 & ~_umask())
+            os.rename(tmppath, self.outpath)
+        except:
+            os.unlink(tmppath)
+            raise
+        self._output = output
+        return True
+
+    def run(self, interval=1.0, report=None):
+        """
+        Poll the watched files every interval seconds until interrupted.
+        report is called with the UpdateStats and error message (None on
+        success) of every update.
+        """
+        while True:
+            try:
+                stats, error = self.poll(), None
+            except Exception as e:
+                stats, error = None, '{}: {}'.format(type(e).__name__, e)
+            if (stats or error) and report:
+                report(stats, error)
+            time.sleep(interval)
+
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
@@ -15,4 +15,10 @@ setup(
             'lit=literate.frontend:main'
         },
     },
+    classifiers=[
+        'Programming Language :: Python :: 2.7',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: Implementation :: CPython',
+        'Programming Language :: Python :: Implementation :: PyPy',
+    ],
     zip_safe=False)
@@ -0,0 +1,112 @@
+import threading
+import unittest
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+import literate
+from literate import Corpus
+from literate.registry import RendererRegistry
+
+latex = r"""
+Text
+\begin{code}{lang=haskell}
+foo      :: Int -> Int
+foo x    =  x + 1
+\end{code}
+"""
+
+
+class BlockingRegistry(RendererRegistry):
+    """A registry that holds every render until release is set."""
+
+    def __init__(self):
+        super(BlockingRegistry, self).__init__()
+        self.started = 0
+        self.release = threading.Event()
+
+    def get(self, *args, **kwargs):
+        self.started += 1
+        self.release.wait(5)
+        return super(BlockingRegistry, self).get(*args, **kwargs)
+
+
+@unittest.skipIf(asyncio is None, 'asyncio requires Python 3')
+class AsyncTests(unittest.TestCase):
+    def setUp(self):
+        from literate.aio import AsyncRenderer
+        self.AsyncRenderer = AsyncRenderer
+        self.expected = Corpus(latex).render()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def run_async(self, awaitable):
+        return self.loop.run_until_complete(awaitable)
+
+    def test_render_async(self):
+        self.assertEqual(self.expected, self.run_async(literate.render_async(latex)))
+
+    def test_render_concurrently(self):
+        renderer = self.AsyncRenderer(workers=2)
+        try:
+            outputs = self.run_async(asyncio.gather(*[renderer.render(latex) for _ in range(4)]))
+        finally:
+            renderer.close()
+        self.assertEqual([self.expected] * 4, outputs)
+
+    def test_render_code(self):
+        renderer = self.AsyncRenderer()
+        try:
+            output = self.run_async(renderer.render_code('foo = 1\n', 'haskell'))
+        finally:
+            renderer.close()
+        self.assertEqual(Corpus('\\begin{code}{lang=haskell}\nfoo = 1\n\\end{code}').render(), output)
+
+    def test_process_pool(self):
+        renderer = self.AsyncRenderer('process', workers=2)
+        try:
+            outputs = self.run_async(asyncio.gather(renderer.render(latex), renderer.render(latex)))
+            with self.assertRaises(RuntimeError):
+                self.run_async(renderer.render(latex.replace('haskell', 'cobol')))
+        finally:
+            renderer.close()
+        self.assertEqual([self.expected] * 2, outputs)
+
+    def test_limit(self):
+        registry = BlockingRegistry()
+        renderer = self.AsyncRenderer(workers=2, limit=1, registry=registry)
+        try:
+            tasks = [self.loop.create_task(renderer.render(latex)) for _ in range(2)]
+            self.run_async(asyncio.sleep(0.2))
+            self.assertEqual(1, registry.started)
+            registry.release.set()
+            self.assertEqual([self.expected] * 2, self.run_async(asyncio.gather(*tasks)))
+        finally:
+            registry.release.set()
+            renderer.close()
+
+    def test_timeout_and_cancel(self):
+        registry = BlockingRegistry()
+        renderer = self.AsyncRenderer(workers=1, registry=registry)
+        try:
+            with self.assertRaises(asyncio.TimeoutError):
+                self.run_async(renderer.render(latex, timeout=0.1))
+            # The timed out render still holds the only slot, so this one waits
+            waiting = self.loop.create_task(renderer.render(latex))
+            self.run_async(asyncio.sleep(0.1))
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                self.run_async(waiting)
+            registry.release.set()
+            self.assertEqual(self.expected, self.run_async(renderer.render(latex, timeout=5)))
+        finally:
+            registry.release.set()
+            renderer.close()
+        # The cancelled render never started
+        self.assertEqual(2, registry.started)
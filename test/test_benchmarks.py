@@ -0,0 +1,22 @@
+import unittest
+
+from literate import Corpus
+from benchmarks import generate, stages
+
+
+class BenchmarkTests(unittest.TestCase):
+    def test_generate(self):
+        text = generate.generate(regions=6, lines=4, haskell=1.0, seed=1)
+        corpus = Corpus(text)
+        self.assertEqual(6, len(corpus.code_regions))
+        for region in corpus.code_regions:
+            self.assertEqual('haskell', region.options['lang'])
+            self.assertEqual(4, len(region.text.splitlines()))
+        self.assertEqual(text, generate.generate(regions=6, lines=4, haskell=1.0, seed=1))
+
+    def test_stages(self):
+        doc = stages.Document(generate.generate(regions=4, lines=5))
+        results = stages.run(doc, repeat=1)
+        self.assertEqual(sorted(name for name, func in stages.STAGES), sorted(results))
+        rendered = [renderer._render(region) for renderer, region in doc.regions]
+        self.assertEqual(rendered, stages.substitute(doc))
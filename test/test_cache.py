@@ -0,0 +1,129 @@
+import shutil
+import tempfile
+import time
+import unittest
+
+import literate
+from literate import Corpus, utils
+from literate import cache as cache_module
+from literate.cache import RenderCache
+from literate.registry import default_registry
+
+latex = r"""
+Some text
+\begin{code}{lang=haskell}
+foo      :: Int -> Int
+foo x    =  x + 1
+\end{code}
+More text
+\begin{code}{lang=scala}
+val x = 5
+\end{code}
+"""
+
+
+class CacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hit(self):
+        cache = RenderCache(self.directory)
+        expected = Corpus(latex).render()
+        self.assertEqual(expected, Corpus(latex, cache=cache).render())
+        self.assertEqual((0, 2), (cache.hits, cache.misses))
+        self.assertEqual(expected, Corpus(latex, cache=RenderCache(self.directory)).render())
+        self.assertEqual(expected, Corpus(latex, cache=cache).render())
+        self.assertEqual((2, 2), (cache.hits, cache.misses))
+
+    def test_unicode(self):
+        text = utils.native_str(u'\\begin{code}{lang=haskell}\nf \u03bb = "h\u00e9llo"\n\\end{code}\n')
+        cache = RenderCache(self.directory)
+        expected = Corpus(text).render()
+        self.assertIn(utils.native_str(u'\u03bb'), expected)
+        self.assertEqual(expected, Corpus(text, cache=cache).render())
+        self.assertEqual(expected, Corpus(text, cache=cache).render())
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_key_depends_on_options(self):
+        cache = RenderCache(self.directory)
+        Corpus(latex, cache=cache).render()
+        Corpus(latex.replace('{lang=scala}', '{lang=scala,gobble=0}'), cache=cache).render()
+        self.assertEqual((1, 3), (cache.hits, cache.misses))
+
+    def test_key_depends_on_render_version(self):
+        cache = RenderCache(self.directory)
+        Corpus(latex, cache=cache).render()
+        version = cache_module.RENDER_VERSION
+        try:
+            cache_module.RENDER_VERSION += 1
+            Corpus(latex, cache=cache).render()
+        finally:
+            cache_module.RENDER_VERSION = version
+        self.assertEqual((0, 4), (cache.hits, cache.misses))
+
+    def test_key_depends_on_format(self):
+        renderer = default_registry.get('haskell', literate.default_config)
+        region = Corpus(latex).code_regions[0]
+        key = RenderCache.key(renderer, region)
+        self.assertEqual(key, RenderCache.key(renderer, region))
+        format = renderer.format
+        try:
+            renderer.format = format + {'subst': {'foo': 'bar'}}
+            self.assertNotEqual(key, RenderCache.key(renderer, region))
+        finally:
+            renderer.format = format
+        self.assertEqual(key, RenderCache.key(renderer, region))
+
+    def test_access_time(self):
+        cache = RenderCache(self.directory)
+        cache.put('a', 'x')
+        conn = cache._connection()
+
+        def atime():
+            return conn.execute('SELECT atime FROM regions WHERE key = ?', ('a',)).fetchone()[0]
+
+        conn.execute('UPDATE regions SET atime = ?', (time.time() - 60,))
+        before = atime()
+        cache.get('a')
+        self.assertEqual(before, atime())
+        conn.execute('UPDATE regions SET atime = ?', (time.time() - 2 * cache_module.ATIME_RESOLUTION,))
+        cache.get('a')
+        self.assertGreater(atime(), time.time() - 60)
+
+    def test_eviction(self):
+        cache = RenderCache(self.directory, max_size=10)
+        cache.put('a', 'x' * 6)
+        cache.put('b', 'y' * 6)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual('y' * 6, cache.get('b'))
+
+    def test_usage(self):
+        cache = RenderCache(self.directory, max_size=10)
+
+        def usage():
+            conn = cache._connection()
+            total = conn.execute('SELECT size FROM usage').fetchone()[0]
+            self.assertEqual(conn.execute('SELECT COALESCE(SUM(size), 0) FROM regions').fetchone()[0], total)
+            return total
+
+        cache.put('a', 'x' * 4)
+        cache.put('a', 'x' * 3)
+        self.assertEqual(3, usage())
+        cache.put('b', 'y' * 6)
+        cache.put('c', 'z' * 6)
+        self.assertEqual(6, usage())
+        cache.clear()
+        self.assertEqual(0, usage())
+
+    def test_usage_of_existing_cache(self):
+        cache = RenderCache(self.directory)
+        cache.put('a', 'x' * 4)
+        conn = cache._connection()
+        conn.execute('DROP TABLE usage')
+        conn.close()
+        cache = RenderCache(self.directory)
+        cache.put('b', 'y' * 2)
+        self.assertEqual(6, cache._connection().execute('SELECT size FROM usage').fetchone()[0])
@@ -1,5 +1,7 @@
+import pickle
 import unittest
 import literate
+from literate.config import LazyConfig
 
 
 class LiterateTests(unittest.TestCase):
@@ -16,3 +18,32 @@ class LiterateTests(unittest.TestCase):
         self.assertEqual('baz', config['bar'])
         config2 = config + literate.Config({'foo': 'quux'})
         self.assertEqual('quux', config2['foo'])
+
+    def test_config_missing_keys_do_not_grow(self):
+        config = literate.Config({'foo': 'bar'})
+        self.assertFalse(config.One.Two.Three)
+        self.assertNotIn('One', config)
+        self.assertEqual(1, len(config))
+
+    def test_config_nested_views(self):
+        config = literate.Config({'One': {'Two': {'Three': 5}}})
+        self.assertIs(config.One, config.One)
+        self.assertIs(config.One.Two, config['One']['Two'])
+
+    def test_config_immutable(self):
+        config = literate.Config({'foo': 'bar'})
+        with self.assertRaises(AttributeError):
+            config.foo = 'baz'
+        self.assertEqual('bar', config.foo)
+
+    def test_config_pickle(self):
+        config = literate.Config({'foo': 'bar', 'One': {'Two': [1, {'Three': 3}]}})
+        copied = pickle.loads(pickle.dumps(config, 2))
+        self.assertEqual(config, copied)
+        self.assertEqual(3, copied.One.Two[1].Three)
+
+    def test_lazy_config(self):
+        config = LazyConfig('literate.conf.json', module=True)
+        self.assertEqual('\\begin{code}', config.delimiters.begin)
+        self.assertEqual(config, pickle.loads(pickle.dumps(config, 2)))
+        self.assertEqual(config, literate.Config() + config)
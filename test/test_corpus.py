@@ -1,3 +1,8 @@
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+import pickle
 import unittest
 import literate
 
@@ -46,10 +51,10 @@ class LiterateTests(unittest.TestCase):
 
     def test_find_blocks(self):
         self.assertNotIn('\\begin', self.corpus._text)
-        self.assertEquals(2, len(self.corpus.code_regions))
-        self.assertEquals('haskell', self.corpus.code_regions[0].options['lang'])
-        self.assertEquals('scala', self.corpus.code_regions[1].options['lang'])
-        self.assertEquals('yes', self.corpus.code_regions[1].options['numbers'])
+        self.assertEqual(2, len(self.corpus.code_regions))
+        self.assertEqual('haskell', self.corpus.code_regions[0].options['lang'])
+        self.assertEqual('scala', self.corpus.code_regions[1].options['lang'])
+        self.assertEqual('yes', self.corpus.code_regions[1].options['numbers'])
 
     def test_render(self):
         hcode = self.corpus.code_regions[0].text
@@ -60,4 +65,91 @@ class LiterateTests(unittest.TestCase):
         stripped = ''.join(c if c.isalpha() else ' ' for c in hcode + scode + ' '.join(LiterateTests.lipsum))
 
         for t in stripped.split():
-            self.assertIn(t, rendered)
\ No newline at end of file
+            self.assertIn(t, rendered)
+
+    def test_segments(self):
+        segments = self.corpus.segments
+        self.assertEqual(['text', 'code', 'text', 'code', 'text'], [s.kind for s in segments])
+        self.assertEqual(self.corpus._text, ''.join(s.text for s in segments))
+        for segment, region in zip([s for s in segments if s.is_code], self.corpus.code_regions):
+            self.assertEqual(segment.text, self.corpus.original_text[segment.start:segment.end])
+            self.assertEqual(segment.text, self.corpus._text[region.start:region.start + region.length])
+            self.assertEqual(segment.options, dict(region.options))
+            self.assertEqual(self.corpus.original_text.count('\n', 0, segment.start) + 1, region.line)
+
+    def test_segments_are_views(self):
+        for segment in self.corpus.segments:
+            self.assertIs(self.corpus.original_text, segment.source)
+        self.assertIsNone(self.corpus._stripped_text)
+        segment = self.corpus.code_regions[1].segment
+        copy = pickle.loads(pickle.dumps(segment))
+        self.assertEqual(segment.text, copy.source)
+        self.assertEqual((segment.text, segment.start, segment.end), (copy.text, copy.start, copy.end))
+
+    def test_parse_options_reexported(self):
+        from literate.corpus import parse_options
+        self.assertEqual(({'lang': 'haskell'}, 'x = 1\n'), parse_options('{lang=haskell}\nx = 1\n'))
+
+    def test_mismatched(self):
+        with self.assertRaises(ValueError):
+            literate.Corpus("foo \\begin{code}{lang=haskell}\nx = 1\n")
+
+    def test_render_repeatable(self):
+        segments = self.corpus.segments
+        first = self.corpus.render()
+        self.assertEqual(first, self.corpus.render())
+        self.assertIs(segments, self.corpus.segments)
+
+    def test_render_parallel(self):
+        parallel = literate.Corpus(self.corpus.original_text)
+        self.assertEqual(self.corpus.render(), parallel.render(jobs=2))
+
+    def test_render_parallel_error(self):
+        corpus = literate.Corpus(self.corpus.original_text.replace('lang=scala', 'lang=cobol'))
+        with self.assertRaises(literate.RenderError) as cm:
+            corpus.render(jobs=2)
+        self.assertEqual(1, cm.exception.index)
+        self.assertEqual(17, cm.exception.line)
+
+    def test_update(self):
+        first = self.corpus.render()
+        text = self.corpus.original_text
+        stats = self.corpus.update(text.replace('foo 0    = 0', 'foo 1    = 1'))
+        self.assertEqual((1, 1, 1), stats)
+        self.assertEqual(literate.Corpus(self.corpus.original_text).render(), self.corpus.render())
+
+        stats = self.corpus.update(text.replace('Hello', 'Goodbye'))
+        self.assertEqual((1, 1, 1), stats)
+        self.assertEqual(first.replace('Hello', 'Goodbye'), self.corpus.render())
+
+    def test_update_duplicates(self):
+        region = '\\begin{code}{lang=haskell}\nbar = 2\n\\end{code}\n'
+        self.corpus.render()
+        stats = self.corpus.update('Text\n' + region * 3)
+        self.assertEqual((0, 3, 2), stats)
+        stats = self.corpus.update('Text\n' + region * 2)
+        self.assertEqual((2, 0, 1), stats)
+        stats = self.corpus.update('Text\n' + region * 4)
+        self.assertEqual((4, 0, 0), stats)
+        self.assertEqual(literate.Corpus(self.corpus.original_text).render(), self.corpus.render())
+
+    def test_update_format(self):
+        self.corpus.render()
+        formats = {'scala': literate.Config({'format': {'val': {'to': 'VALUE'}}})}
+        stats = self.corpus.update(self.corpus.original_text, formats=formats)
+        self.assertEqual((1, 1, 0), stats)
+        self.assertIn('VALUE', self.corpus.render())
+
+    def test_render_stream(self):
+        output = StringIO()
+        literate.render_stream(StringIO(self.corpus.original_text), output)
+        self.assertEqual(self.corpus.render(), output.getvalue())
+
+    def test_render_stream_error(self):
+        text = self.corpus.original_text.replace('lang=scala', 'lang=cobol')
+        output = StringIO()
+        with self.assertRaises(literate.RenderError) as cm:
+            literate.render_stream(StringIO(text), output)
+        self.assertEqual(1, cm.exception.index)
+        self.assertEqual(17, cm.exception.line)
+        self.assertIn('Integer in efficitur', output.getvalue())
@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from literate import Corpus
+from literate.frontend import find_inputs, render_batch
+
+latex = r"""
+Text
+\begin{code}{lang=haskell}
+foo x = x + 1
+\end{code}
+"""
+
+
+class FrontendTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'in', 'sub'))
+        for name in ['a.tex', 'b.txt', os.path.join('sub', 'c.tex')]:
+            with open(os.path.join(self.directory, 'in', name), 'w') as f:
+                f.write(latex)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def test_find_inputs(self):
+        pairs = find_inputs([self.path('in')], '*.tex', output_dir=self.path('out'))
+        self.assertEqual([(self.path('in', 'a.tex'), self.path('out', 'a.tex')),
+                          (self.path('in', 'sub', 'c.tex'), self.path('out', 'sub', 'c.tex'))], pairs)
+        pairs = find_inputs([self.path('in', 'b.txt'), self.path('in')], '*.tex', suffix='.out.tex')
+        self.assertEqual([(self.path('in', 'b.txt'), self.path('in', 'b.out.tex')),
+                          (self.path('in', 'a.tex'), self.path('in', 'a.out.tex')),
+                          (self.path('in', 'sub', 'c.tex'), self.path('in', 'sub', 'c.out.tex'))], pairs)
+
+    def test_render_batch(self):
+        pairs = find_inputs([self.path('in')], '*.tex', output_dir=self.path('out'))
+        pairs.append((self.path('in', 'missing.tex'), self.path('out', 'missing.tex')))
+        reports = []
+        failures = render_batch(pairs, None, {}, report=lambda *args: reports.append(args))
+        self.assertEqual(1, failures)
+        self.assertEqual([None, None], [error for _, _, error in reports[:2]])
+        with open(self.path('out', 'sub', 'c.tex')) as f:
+            self.assertEqual(Corpus(latex).render(), f.read())
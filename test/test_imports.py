@@ -0,0 +1,30 @@
+import json
+import subprocess
+import sys
+import unittest
+
+_probe = """
+import json, sys
+import literate, literate.frontend
+before = sorted(m for m in sys.modules if sys.modules[m] is not None)
+literate.Corpus(sys.argv[1]).render()
+after = sorted(m for m in sys.modules if sys.modules[m] is not None)
+print(json.dumps([before, after]))
+"""
+
+
+class ImportTests(unittest.TestCase):
+    def modules(self, text):
+        output = subprocess.check_output([sys.executable, '-c', _probe, text])
+        return json.loads(output.decode('utf-8'))
+
+    def test_lazy_imports(self):
+        before, after = self.modules('No code here')
+        for name in ['pygments', 'literate.renderer', 'multiprocessing', 'sqlite3', 'asyncio']:
+            self.assertNotIn(name, before)
+        self.assertNotIn('pygments', after)
+
+    def test_unused_renderers(self):
+        before, after = self.modules('\\begin{code}{lang=haskell}\nfoo = 1\n\\end{code}\n')
+        self.assertIn('literate.renderer.haskell', after)
+        self.assertNotIn('literate.renderer.scala', after)
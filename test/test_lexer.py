@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+
+from pygments.lexers.haskell import HaskellLexer
+
+from benchmarks.generate import generate
+from literate import Corpus, utils
+from literate.renderer.lexer import combined
+from literate.renderer.scala import ScalaLexer
+
+sources = [
+    u'',
+    u'\n\n',
+    u'main = do\n  putStrLn "unterminated\n  print 1\n',
+    u'{- nested {- block -} comment -}\nx = \'a\' : "b\\"c" ++ [\'\\n\']\n',
+    u'f :: (Monad m) => m a -> m ()\nf = void . (>>= return) $ x `seq` 0x1F + 1.5e3\n',
+    u'data λ = Λ | Ω deriving (Show)\n',
+    u'class Foo[T <: Bar](x: Int) extends Baz with Qux {\n  def f[A >: B](a: A): A = a\n}\n',
+    u'object Main {\n  val s = s"interp ${x + 1} $y" + f"""triple $z""" + raw"\\d"\n}\n',
+    u'/* unterminated comment\nval x = 1\n',
+    u'import scala.collection.{mutable => m, _}\ntype Pair = (Int, String)\n',
+    u'val `weird name` = \'sym; val ünïcödé_+ = 1 // comment\n@annotation def x = ???',
+]
+
+alphabet = u' \n\t{}()[]<>=:;,.\'"`$_+-*/\\|&@#%!?~^0123456789abcxyzXYZ λΩ' + u'\u2190\u21d2'
+words = [u'class ', u'object ', u'extends ', u'import ', u'type ', u'val ', u'def ', u'case ', u'where ',
+         u'let ', u'--', u'{-', u'-}', u'/*', u'*/', u'//', u'"""', u's"', u'f"', u'${', u'0x', u'=>']
+
+
+class LexerTests(unittest.TestCase):
+    def assertSameTokens(self, lexer_cls, texts):
+        expected, actual = lexer_cls(), combined(lexer_cls)()
+        for text in texts:
+            self.assertEqual(list(expected.get_tokens_unprocessed(text)),
+                             list(actual.get_tokens_unprocessed(text)), text)
+
+    def corpus(self, haskell, seed):
+        texts = list(sources)
+        texts += [utils.to_text(r.text) for r in Corpus(generate(40, 10, haskell=haskell, seed=seed)).code_regions]
+        rng = random.Random(seed)
+        for _ in range(300):
+            texts.append(u''.join(rng.choice(words) if rng.random() < 0.2 else rng.choice(alphabet)
+                                  for _ in range(rng.randint(1, 60))))
+        return texts
+
+    def test_haskell(self):
+        self.assertSameTokens(HaskellLexer, self.corpus(1.0, 1))
+
+    def test_scala(self):
+        self.assertSameTokens(ScalaLexer, self.corpus(0.0, 2))
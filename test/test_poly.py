@@ -1,8 +1,10 @@
 import unittest
 
+from pygments.token import Token
+
 from literate import Corpus
-from literate.renderer.haskell import HaskellRenderer
-from literate.renderer.poly import Sub
+from literate.renderer.haskell import HaskellRenderer, HaskellSpacer
+from literate.renderer.poly import Sub, SubstTemplate, Tok, TokStream
 
 latex = r"""
 Foobar
@@ -52,3 +54,61 @@ class PolyTests(unittest.TestCase):
 
     def test_gobble(self):
         self.assertEqual(4, self.tok_stream.gobble_size)
+
+    def test_subst_template(self):
+        template = SubstTemplate("\\>[^1]{} ^3 {}\\<[^2]%\n")
+        self.assertEqual("\\>[0]{} x {}\\<[E]%\n", template('0', 'E', 'x'))
+        self.assertEqual("\\>[0]{} ^3 {}\\<[^2]%\n", template('0'))
+        self.assertEqual(['\\Keyword{^1}'], self.renderer.substitute(Sub('Keyword')))
+        self.assertEqual(['??Nope??'], self.renderer.substitute(Sub('Nope', 'x')))
+        self.assertEqual(['\\Indent{??Nope??}'], self.renderer.substitute(Sub('Indent', Sub('Nope'))))
+
+    def test_substitute_token(self):
+        renderer = self.corpus.registry.get('haskell', self.corpus.config)
+        self.assertEqual('\\to', renderer.substitute_token(Token.Operator, '->'))
+        self.assertEqual('\\lambda', renderer.substitute_token(Token.Name.Function, '\\'))
+        self.assertEqual('\\Name{foo}', renderer.substitute_token(Token.Name, 'foo'))
+        self.assertEqual('\\String{x}', renderer.substitute_token(Token.Literal.String.Char, 'x'))
+        self.assertEqual(' ', renderer.substitute_token(Token.Text, '  '))
+        self.assertEqual(['\\Name{foo}'], renderer.substitute(Tok(Token.Name, 'foo', 0, 0)))
+
+    def test_rows(self):
+        self.assertEqual(4, self.tok_stream.num_rows)
+        self.assertEqual(['align', '::', 'Int', '->', 'Int'],
+                         [t.value for t in self.tok_stream.get_row_contents(0)])
+        self.assertEqual(['      ', 'where', '\n'], [t.value for t in self.tok_stream.get_row_contents(2, True)])
+        self.assertEqual([], self.tok_stream.get_row_contents(100))
+
+    def test_column_cells(self):
+        columns = self.tok_stream.columns
+        self.assertEqual({4, 6, 8, 11, 16, 20}, set(columns))
+        self.assertEqual([['where']], [[t.value for t in cell] for cell in columns[6]])
+        self.assertEqual([['Int', ' ', '->', ' ', 'Int', '\n']],
+                         [[t.value for t in cell] for cell in self.tok_stream.get_column_contents(20, True)][:1])
+        self.assertIs(self.tok_stream.aligned_cols, self.tok_stream.aligned_cols)
+
+    def test_spacer(self):
+        should_space = HaskellSpacer.matcher()
+        self.assertIs(should_space, HaskellSpacer.matcher())
+        self.assertTrue(should_space('foo', '('))
+        self.assertTrue(should_space(',', 'x'))
+        self.assertFalse(should_space('(', 'x'))
+        self.assertFalse(should_space('foo', '+'))
+
+    def test_tok_stream_sequence(self):
+        toks = list(self.tok_stream)
+        self.assertEqual(len(toks), len(self.tok_stream))
+        self.assertEqual(toks[-1].value, self.tok_stream[-1].value)
+        self.assertEqual([t.value for t in toks[2:5]], [t.value for t in self.tok_stream[2:5]])
+        with self.assertRaises(IndexError):
+            self.tok_stream[len(toks)]
+
+        copied = TokStream(toks)
+        for a, b in zip(toks, copied):
+            self.assertEqual((a.type, a.value, a.row, a.col, a.aligned), (b.type, b.value, b.row, b.col, b.aligned))
+        self.assertEqual(self.tok_stream.aligned_cols, copied.aligned_cols)
+
+    def test_tok_stream_unordered_rows(self):
+        stream = TokStream([Tok(Token.Name, 'b', 1, 0), Tok(Token.Name, 'a', 0, 0), Tok(Token.Name, 'c', 1, 2)])
+        self.assertEqual(['b', 'c'], [t.value for t in stream.get_row_contents(1)])
+        self.assertEqual(['a'], [t.value for t in stream.get_row_contents(0)])
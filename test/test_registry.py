@@ -0,0 +1,57 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import literate
+from literate.registry import RendererRegistry
+
+
+class TempRegistry(RendererRegistry):
+    directory = None
+
+    @classmethod
+    def format_path(cls, lang):
+        return os.path.join(cls.directory, lang + '.json')
+
+
+class RegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.config = literate.default_config
+        TempRegistry.directory = tempfile.mkdtemp()
+        self.write_format({'format': {'->': {'to': '\\to'}}})
+        self.write_format({}, lang='scala')
+        self.registry = TempRegistry()
+
+    def tearDown(self):
+        shutil.rmtree(TempRegistry.directory)
+
+    def write_format(self, fmt, mtime=None, lang='haskell'):
+        path = TempRegistry.format_path(lang)
+        with open(path, 'w') as f:
+            json.dump(fmt, f)
+        if mtime:
+            os.utime(path, (mtime, mtime))
+
+    def test_reuse(self):
+        renderer = self.registry.get('haskell', self.config)
+        self.assertIs(renderer, self.registry.get('haskell', self.config))
+        self.assertIsNot(renderer, self.registry.get('scala', self.config))
+        extra = literate.Config({'format': {'->': {'to': '\\rightarrow'}}})
+        self.assertIsNot(renderer, self.registry.get('haskell', self.config, extra))
+        self.assertIs(self.registry.get('haskell', self.config, extra),
+                      self.registry.get('haskell', self.config, literate.Config(extra)))
+
+    def test_unknown_language(self):
+        with self.assertRaises(RuntimeError):
+            self.registry.get('cobol', self.config)
+
+    def test_refresh(self):
+        renderer = self.registry.get('haskell', self.config)
+        self.assertEqual('\\to', renderer.format.format['->']['to'])
+        self.assertEqual([], self.registry.refresh())
+        self.write_format({'format': {'->': {'to': '\\longrightarrow'}}}, mtime=1)
+        self.assertEqual(['haskell'], self.registry.refresh())
+        renderer = self.registry.get('haskell', self.config)
+        self.assertEqual('\\longrightarrow', renderer.format.format['->']['to'])
@@ -0,0 +1,101 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from literate import Corpus
+from literate import server
+from literate.server import RenderServer, ServerUnavailable, render_remote
+
+latex = r"""
+Text
+\begin{code}{lang=haskell}
+foo      :: Int -> Int
+foo x    =  x + 1
+\end{code}
+"""
+
+
+class ServerTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'lit.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_render_remote(self):
+        server = RenderServer(self.path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            self.assertEqual(Corpus(latex).render(), render_remote(latex, path=self.path))
+            with self.assertRaises(RuntimeError):
+                render_remote(latex.replace('haskell', 'cobol'), path=self.path)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_unavailable(self):
+        with self.assertRaises(ServerUnavailable):
+            render_remote(latex, path=self.path)
+
+    def test_unresponsive(self):
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen(1)
+        replied = threading.Event()
+
+        def handle(hang):
+            conn, _ = listener.accept()
+            server._recv(conn)
+            if hang:
+                replied.wait(5)
+            conn.close()
+
+        try:
+            for hang, timeout in [(True, 0.2), (False, 5)]:
+                thread = threading.Thread(target=handle, args=(hang,))
+                thread.start()
+                try:
+                    with self.assertRaises(ServerUnavailable):
+                        render_remote(latex, path=self.path, timeout=timeout)
+                finally:
+                    replied.set()
+                    thread.join()
+        finally:
+            listener.close()
+
+    def test_refuses_to_remove_other_files(self):
+        with open(self.path, 'w') as f:
+            f.write('notes')
+        with self.assertRaises(RuntimeError):
+            RenderServer(self.path)
+        with open(self.path) as f:
+            self.assertEqual('notes', f.read())
+
+    @unittest.skipUnless(hasattr(os, 'getuid') and os.getuid() == 0, 'changing the owner of a file requires root')
+    def test_other_users_socket(self):
+        server = RenderServer(self.path)
+        try:
+            os.chown(self.path, 12345, -1)
+            with self.assertRaises(ServerUnavailable):
+                render_remote(latex, path=self.path)
+        finally:
+            server.server_close()
+
+    def test_default_path_is_private(self):
+        environ = dict(os.environ)
+        try:
+            os.environ.pop('LIT_SOCKET', None)
+            os.environ.pop('XDG_RUNTIME_DIR', None)
+            path = server.default_socket_path()
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+        self.assertNotEqual('/tmp', os.path.dirname(path))
+        self.assertTrue(os.path.dirname(path).startswith('/tmp/'))
@@ -0,0 +1,57 @@
+import json
+import shutil
+import tempfile
+import unittest
+
+import literate
+from literate import stats
+from literate.cache import RenderCache
+
+latex = r"""
+Text
+\begin{code}{lang=haskell}
+foo x    = x + 1
+foo 0    = 0
+\end{code}
+More text
+\begin{code}{lang=scala}
+val y = 2
+\end{code}
+"""
+
+
+class StatsTests(unittest.TestCase):
+    def tearDown(self):
+        stats.disable()
+
+    def test_collect(self):
+        expected = literate.Corpus(latex).render()
+        collected = stats.enable()
+        self.assertEqual(expected, literate.Corpus(latex).render())
+        self.assertIs(collected, stats.disable())
+        self.assertIsNone(stats.active)
+
+        self.assertEqual([4, 9], sorted(r.line for r in collected.regions))
+        self.assertEqual(['haskell', 'scala'], sorted(r.lang for r in collected.regions))
+        self.assertTrue(all(r.tokens > 0 for r in collected.regions))
+        self.assertEqual(sorted(stats.STAGES), sorted(collected.times))
+
+        summary = json.loads(collected.format(slowest=1, as_json=True))
+        self.assertEqual(2, summary['regions'])
+        self.assertEqual(1, len(summary['slowest']))
+        self.assertIn('haskell', collected.format())
+
+    def test_cached(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache = RenderCache(directory)
+            collected = stats.enable()
+            literate.Corpus(latex, cache=cache).render()
+            self.assertEqual((2, 0), (len(collected.regions), collected.cached))
+            collected = stats.enable()
+            literate.Corpus(latex, cache=cache).render()
+            stats.disable()
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual((0, 2), (len(collected.regions), collected.cached))
+        self.assertEqual(2, json.loads(collected.format(as_json=True))['cached'])
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from literate import utils
+
+
+class UtilsTests(unittest.TestCase):
+    def test_latex_escape(self):
+        self.assertEqual('foo', utils.latex_escape('foo'))
+        self.assertEqual(r'\textbackslash{}x', utils.latex_escape('\\x'))
+        self.assertEqual(r'a\^{}b', utils.latex_escape('a^b'))
+        self.assertEqual(r'\~{}\{\}', utils.latex_escape('~{}'))
+        self.assertEqual(r'\#\$\%\&\_', utils.latex_escape('#$%&_'))
+        self.assertEqual(r'\char34 x\char39 ', utils.latex_escape('"x\''))
+        self.assertEqual(r'\textbackslash{}\textbackslash{}', utils.latex_escape('\\\\'))
+        self.assertEqual(u'λ\\_', utils.latex_escape(u'λ_'))
+
+    def test_bounded_cache(self):
+        cache = utils.BoundedCache(2)
+        self.assertEqual(1, cache.put('a', 1))
+        cache.put('b', 2)
+        cache.put('c', 3)
+        self.assertEqual({'c': 3}, cache)
@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from literate import Corpus
+from literate.watch import Watcher
+
+latex = r"""
+Text
+\begin{code}{lang=haskell}
+foo x = x + 1
+\end{code}
+\begin{code}{lang=scala}
+val y = 2
+\end{code}
+"""
+
+
+class WatchTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.inpath = self.path('in.tex')
+        self.outpath = self.path('out.tex')
+        self.write(self.inpath, latex)
+        self.write(self.path('scala.json'), json.dumps({'format': {'val': {'to': 'VALUE'}}}))
+        self.watcher = Watcher(self.inpath, self.outpath)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def write(self, path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+        # Make sure the change is visible even on coarse timestamps
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_poll(self):
+        stats = self.watcher.poll()
+        self.assertEqual((0, 2, 0), stats)
+        self.assertEqual(Corpus(latex).render(), self.read(self.outpath))
+        self.assertIsNone(self.watcher.poll())
+
+        changed = latex.replace('x + 1', 'x + 2')
+        self.write(self.inpath, changed)
+        self.assertEqual((1, 1, 1), self.watcher.poll())
+        self.assertEqual(Corpus(changed).render(), self.read(self.outpath))
+
+    def test_unchanged_output(self):
+        self.watcher.poll()
+        mtime = int(os.stat(self.outpath).st_mtime) - 10
+        os.utime(self.outpath, (mtime, mtime))
+        self.write(self.inpath, latex.replace('Text', 'Text'))
+        self.assertEqual((2, 0, 0), self.watcher.poll())
+        self.assertEqual(mtime, os.stat(self.outpath).st_mtime)
+
+    def test_format_change(self):
+        self.watcher.format_paths = [('scala', self.path('scala.json'))]
+        self.watcher.poll()
+        self.assertIn('VALUE', self.read(self.outpath))
+        self.write(self.path('scala.json'), json.dumps({'format': {'val': {'to': 'VAL'}}}))
+        self.assertEqual((1, 1, 0), self.watcher.poll())
+        self.assertNotIn('VALUE', self.read(self.outpath))
+
+    def test_error_keeps_output(self):
+        self.watcher.poll()
+        output = self.read(self.outpath)
+        self.write(self.inpath, latex.replace('lang=scala', 'lang=cobol'))
+        with self.assertRaises(Exception):
+            self.watcher.poll()
+        self.assertEqual(output, self.read(self.outpath))
+        self.assertEqual(['in.tex', 'out.tex', 'scala.json'], sorted(os.listdir(self.directory)))